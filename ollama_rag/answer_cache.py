@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of RAG answers keyed by the query embedding.
+
+    A lookup returns the answer of the most similar cached question when its cosine
+    similarity reaches `threshold`, so repeated and reworded questions skip retrieval
+    and generation. Entries expire after `ttl` seconds, the least recently used ones
+    are evicted beyond `max_entries`, and the whole cache is dropped whenever
+    `version_fn` (e.g. a fingerprint of the vector store) returns a new value.
+    Answers are only matched against entries stored with the same `scope`, which
+    carries the request options that change the answer (k, filters, ...).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        version_fn: Optional[Callable[[], object]] = None,
+        version_check_interval: float = 5.0,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._matrices = {}
+        self._version = version_fn() if version_fn else None
+        self._version_checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        now = time.monotonic()
+        if self.version_fn is None or now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            self._clear()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry["created"] < cutoff]
+        for key in expired:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._matrices.pop(entry["scope"], None)
+
+    def _scope_matrix(self, scope: str):
+        # Stacked vectors per scope are rebuilt only after the scope changes
+        if scope not in self._matrices:
+            keys = [key for key, entry in self._entries.items() if entry["scope"] == scope]
+            matrix = np.stack([self._entries[key]["vector"] for key in keys]) if keys else None
+            self._matrices[scope] = (keys, matrix)
+        return self._matrices[scope]
+
+    def lookup(self, query_vector, scope: str = ""):
+        """
+        Returns the cached answer for the most similar question, or None.
+        """
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_version()
+            self._expire()
+            keys, matrix = self._scope_matrix(scope)
+            if matrix is not None:
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]["value"]
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, value, scope: str = ""):
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_version()
+            key = self._next_id
+            self._next_id += 1
+            self._entries[key] = {"vector": vector, "scope": scope, "value": value, "created": time.monotonic()}
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _clear(self):
+        self._entries.clear()
+        self._matrices.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rag import RagPipeline, build_metadata_filter
+from streaming import batched
+from timing import percentile
+
+BATCH_QA_BATCH_SIZE = int(os.getenv('BATCH_QA_BATCH_SIZE', '64'))
+BATCH_QA_CONCURRENCY = int(os.getenv('BATCH_QA_CONCURRENCY', '4'))
+
+
+def read_questions(input_path: str):
+    """
+    Yields question records from a JSONL file. Records without an `id` get their line number.
+    """
+    with open(input_path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("id", line_number)
+            yield record
+
+
+def completed_ids(output_path: str) -> set:
+    """
+    Returns the IDs already answered in an output file, so an interrupted run can resume.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                # A line cut short by an interruption is simply redone
+                continue
+    return done
+
+
+def retrieve_batch(pipeline: RagPipeline, records: list, query_vectors: list) -> list:
+    """
+    Retrieves context for a batch of questions with one vector-store query per distinct filter.
+    """
+    groups = {}
+    for index, record in enumerate(records):
+        search_filter = build_metadata_filter(**record.get("filter", {}))
+        key = json.dumps(search_filter, sort_keys=True)
+        groups.setdefault(key, (search_filter, []))[1].append(index)
+
+    hits = [None] * len(records)
+    for search_filter, indices in groups.values():
+        group_hits = pipeline.retrieve_many_with_scores(
+            [query_vectors[i] for i in indices], pipeline.retrieval_k(), search_filter
+        )
+        for index, record_hits in zip(indices, group_hits):
+            hits[index] = record_hits
+    return hits
+
+
+def retrieved_ids(documents: list) -> list:
+    """
+    Returns the vector-store IDs behind the prompt documents; a collapsed parent
+    contributes the IDs of the hits it replaced.
+    """
+    ids = []
+    for document in documents:
+        ids.extend(document.metadata.get("child_ids") or [document.id])
+    return ids
+
+
+def run_batch(input_path: str, output_path: str, persist_directory: str, batch_size: int = BATCH_QA_BATCH_SIZE, concurrency: int = BATCH_QA_CONCURRENCY):
+    """
+    Answers every question in a JSONL file and appends the results to another JSONL file.
+
+    Questions are embedded and retrieved a batch at a time, so those stages are timed
+    and reported per batch. Generation runs with at most `concurrency` LLM calls in
+    flight, and every answer is flushed as soon as it is ready. Questions already present in the output are skipped, so re-running after
+    an interruption resumes where the previous run stopped.
+    """
+    pipeline = RagPipeline(persist_directory, answer_cache=False)
+    done = completed_ids(output_path)
+    # Embedding and retrieval run once per batch, so they are only measured per batch
+    latencies = {"generate": []}
+    batch_latencies = {"embed_query": [], "retrieve": []}
+    answered = 0
+    started = time.perf_counter()
+
+    def answer_record(record, documents, batch_timings):
+        generate_started = time.perf_counter()
+        answer = pipeline.generate(record["question"], documents)
+        return {
+            "id": record["id"],
+            "question": record["question"],
+            "answer": answer,
+            "retrieved_ids": retrieved_ids(documents),
+            "timings_ms": {"generate": (time.perf_counter() - generate_started) * 1000},
+            "batch_timings_ms": batch_timings,
+        }
+
+    pending = (record for record in read_questions(input_path) if record["id"] not in done)
+
+    with open(output_path, "a") as output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for records in batched(pending, batch_size):
+            stage_started = time.perf_counter()
+            query_vectors = pipeline.embeddings.embed_documents([record["question"] for record in records])
+            embed_ms = (time.perf_counter() - stage_started) * 1000
+
+            stage_started = time.perf_counter()
+            hits = retrieve_batch(pipeline, records, query_vectors)
+            contexts = [pipeline.select_context(record_hits) for record_hits in hits]
+            retrieve_ms = (time.perf_counter() - stage_started) * 1000
+
+            batch_latencies["embed_query"].append(embed_ms)
+            batch_latencies["retrieve"].append(retrieve_ms)
+            batch_timings = {"embed_query": embed_ms, "retrieve": retrieve_ms, "batch_size": len(records)}
+            futures = [
+                executor.submit(answer_record, record, documents, batch_timings)
+                for record, documents in zip(records, contexts)
+            ]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"An error occurred while answering a question: {e}")
+                    continue
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                for stage, ms in result["timings_ms"].items():
+                    latencies[stage].append(ms)
+                answered += 1
+
+            elapsed = time.perf_counter() - started
+            print(f"{answered} questions answered in {elapsed:.1f}s ({answered / elapsed:.2f} q/s)")
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Answered {answered} questions ({len(done)} skipped as already done) "
+          f"in {elapsed:.1f}s: {answered / elapsed:.2f} questions/s")
+    print("Per question:")
+    for stage, values in latencies.items():
+        print(f"  {stage:<12} p50 {percentile(values, 50):9.1f} ms   "
+              f"p95 {percentile(values, 95):9.1f} ms   p99 {percentile(values, 99):9.1f} ms")
+    print(f"Per batch (up to {batch_size} questions):")
+    for stage, values in batch_latencies.items():
+        print(f"  {stage:<12} p50 {percentile(values, 50):9.1f} ms   "
+              f"p95 {percentile(values, 95):9.1f} ms   p99 {percentile(values, 99):9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL question bank against the vector store.")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"question\", \"filter\"?} per line")
+    parser.add_argument("output", help="JSONL file the answers are appended to")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QA_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BATCH_QA_CONCURRENCY)
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, args.persist_directory, args.batch_size, args.concurrency)
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from timing import percentile
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(backend: str, args) -> dict:
+    """
+    Loads one backend, runs the query set against it and reports load time, latency and RSS.
+    """
+    queries = np.load(args.query_file)
+    search_filter = json.loads(args.filter) if args.filter else None
+
+    started = time.perf_counter()
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+
+        collection = Chroma(persist_directory=args.persist_directory)._collection
+        collection.count()
+
+        def search(vector):
+            collection.query(query_embeddings=[vector.tolist()], n_results=args.k, where=search_filter)
+    else:
+        from mmap_store import MmapVectorStore
+
+        store = MmapVectorStore(args.mmap_directory)
+
+        def search(vector):
+            store.similarity_search_by_vector_with_relevance_scores(vector, k=args.k, filter=search_filter)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for vector in queries:
+        query_started = time.perf_counter()
+        search(vector)
+        latencies.append((time.perf_counter() - query_started) * 1000)
+
+    return {
+        "backend": backend,
+        "load_ms": load_ms,
+        "first_query_ms": latencies[0],
+        "p50_ms": percentile(latencies[1:], 50),
+        "p95_ms": percentile(latencies[1:], 95),
+        "p99_ms": percentile(latencies[1:], 99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(args):
+    """
+    Benchmarks each backend in a fresh subprocess so load time and RSS are not shared.
+    """
+    from mmap_store import MmapVectorStore
+
+    # Queries are stored vectors plus noise, so no embedding model is needed
+    store = MmapVectorStore(args.mmap_directory)
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(len(store), size=min(args.queries, len(store)), replace=False))
+    queries = np.asarray(store.vectors[rows], dtype=np.float32)
+    queries += rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+    del store
+
+    with tempfile.NamedTemporaryFile(suffix=".npy", delete=False) as query_file:
+        np.save(query_file, queries)
+
+    results = []
+    try:
+        for backend in ("chroma", "mmap"):
+            command = [
+                sys.executable, os.path.abspath(__file__),
+                "--worker", backend,
+                "--query-file", query_file.name,
+                "--persist-directory", args.persist_directory,
+                "--mmap-directory", args.mmap_directory,
+                "--k", str(args.k),
+            ]
+            if args.filter:
+                command += ["--filter", args.filter]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        os.remove(query_file.name)
+
+    print(f"{len(queries)} queries, k={args.k}, filter={args.filter or 'none'}")
+    print(f"{'backend':<8} {'load':>10} {'first':>10} {'p50':>9} {'p95':>9} {'p99':>9} {'peak RSS':>10}")
+    for result in results:
+        print(
+            f"{result['backend']:<8} {result['load_ms']:8.1f}ms {result['first_query_ms']:8.1f}ms "
+            f"{result['p50_ms']:7.2f}ms {result['p95_ms']:7.2f}ms {result['p99_ms']:7.2f}ms "
+            f"{result['peak_rss_mb']:8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Chroma and the memory-mapped store.")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--mmap-directory", default="./mmap_db")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--filter", help="Chroma where clause as JSON, e.g. '{\"source_file\": \"a.txt\"}'")
+    parser.add_argument("--worker", choices=["chroma", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--query-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args)))
+    else:
+        run_benchmark(args)
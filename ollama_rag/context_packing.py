@@ -0,0 +1,158 @@
+import re
+from typing import Callable, List, Tuple
+
+from langchain_core.documents import Document
+
+# Metadata key referencing a hit's parent chunk in the parent store (written by extreme-split.py)
+PARENT_ID_KEY = "parent_id"
+# Older indexes carry the parent chunk text itself under this key
+PARENT_TEXT_KEY = "context"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token), good enough for budgeting.
+    """
+    return max(1, len(text) // 4)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def expand_parents(documents: List[Document], parent_store=None) -> List[Document]:
+    """
+    Attaches each document's parent chunk text under `context`, resolving every
+    `parent_id` with one parent store lookup. Documents that already carry the text,
+    or whose parent is unknown, are returned as they are.
+    """
+    parent_ids = [
+        document.metadata[PARENT_ID_KEY]
+        for document in documents
+        if document.metadata.get(PARENT_ID_KEY) and PARENT_TEXT_KEY not in document.metadata
+    ]
+    if parent_store is None or not parent_ids:
+        return documents
+
+    parent_texts = parent_store.get_many(parent_ids)
+    expanded = []
+    for document in documents:
+        parent_text = parent_texts.get(document.metadata.get(PARENT_ID_KEY))
+        if parent_text is None or PARENT_TEXT_KEY in document.metadata:
+            expanded.append(document)
+        else:
+            metadata = {**document.metadata, PARENT_TEXT_KEY: parent_text}
+            expanded.append(Document(page_content=document.page_content, metadata=metadata, id=document.id))
+    return expanded
+
+
+def _parent_key(document: Document):
+    parent_id = document.metadata.get(PARENT_ID_KEY)
+    if parent_id:
+        return ("id", parent_id)
+    parent_text = document.metadata.get(PARENT_TEXT_KEY)
+    if parent_text:
+        return ("text", parent_text)
+    return ("hit", id(document))
+
+
+def _collapse_parents(hits: List[Tuple[Document, float]], parent_store=None) -> List[Tuple[Document, float, list]]:
+    """
+    Merges hits that share a parent chunk into a single unit holding the parent text.
+
+    Parents referenced by ID are taken from the hits' `context` when `expand_parents`
+    already attached it, otherwise fetched from `parent_store` in one lookup, each once.
+    Each unit is (document, score, fallback), where `fallback` lists the individual
+    hits to use instead when the parent text does not fit the budget.
+    """
+    groups = {}
+    for document, score in hits:
+        groups.setdefault(_parent_key(document), []).append((document, score))
+
+    shared_ids = [
+        key[1] for key, members in groups.items()
+        if key[0] == "id" and len(members) > 1 and PARENT_TEXT_KEY not in members[0][0].metadata
+    ]
+    parent_texts = parent_store.get_many(shared_ids) if parent_store is not None and shared_ids else {}
+
+    units = []
+    for (kind, key), members in groups.items():
+        best_score = max(score for _, score in members)
+        if kind == "text":
+            parent_text = key
+        else:
+            parent_text = members[0][0].metadata.get(PARENT_TEXT_KEY) or parent_texts.get(key)
+        if len(members) == 1 or parent_text is None:
+            units.extend((_strip_parent(document), score, []) for document, score in members)
+        else:
+            first = members[0][0]
+            metadata = {k: v for k, v in first.metadata.items() if k != PARENT_TEXT_KEY}
+            metadata["collapsed_hits"] = len(members)
+            # The parent is not itself indexed; keep the IDs of the hits it stands for
+            metadata["child_ids"] = [document.id for document, _ in members]
+            parent_document = Document(page_content=parent_text, metadata=metadata)
+            fallback = [(_strip_parent(document), score) for document, score in members]
+            units.append((parent_document, best_score, fallback))
+    return units
+
+
+def _strip_parent(document: Document) -> Document:
+    if PARENT_TEXT_KEY not in document.metadata:
+        return document
+    metadata = {k: v for k, v in document.metadata.items() if k != PARENT_TEXT_KEY}
+    return Document(page_content=document.page_content, metadata=metadata, id=document.id)
+
+
+def pack_context(
+    hits: List[Tuple[Document, float]],
+    token_budget: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+    parent_store=None,
+) -> List[Document]:
+    """
+    Selects the retrieved documents to stuff into the prompt, within a token budget.
+
+    `hits` are (document, relevance) pairs, higher relevance first. Hits sharing a
+    parent chunk collapse into one copy of the parent, documents whose text is already
+    contained in a selected document are dropped, and the budget is filled greedily by
+    relevance. A collapsed parent that does not fit falls back to its individual hits.
+    Parents referenced by `parent_id` are expanded from `parent_store`.
+    """
+    units = sorted(_collapse_parents(hits, parent_store), key=lambda unit: unit[1], reverse=True)
+
+    selected = []  # (document, normalized text, tokens)
+    used = 0
+
+    def try_add(document: Document) -> bool:
+        nonlocal used
+        text = _normalize(document.page_content)
+        if any(text in other for _, other, _ in selected):
+            return True  # Already covered by a selected document
+
+        # A new document that contains selected ones replaces them
+        contained = [entry for entry in selected if entry[1] in text]
+        tokens = count_tokens(document.page_content)
+        freed = sum(entry[2] for entry in contained)
+        if used - freed + tokens > token_budget:
+            return False
+
+        for entry in contained:
+            selected.remove(entry)
+        selected.append((document, text, tokens))
+        used += tokens - freed
+        return True
+
+    for document, _, fallback in units:
+        if not try_add(document):
+            for hit, _ in fallback:
+                try_add(hit)
+
+    return [document for document, _, _ in selected]
+
+
+def pack_documents(documents: List[Document], token_budget: int, count_tokens: Callable[[str], int] = estimate_tokens, parent_store=None) -> List[Document]:
+    """
+    Packs documents that come without scores, treating their order as their rank.
+    """
+    hits = [(document, -rank) for rank, document in enumerate(documents)]
+    return pack_context(hits, token_budget, count_tokens, parent_store)
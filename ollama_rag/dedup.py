@@ -0,0 +1,104 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+# Mersenne prime for the universal hash family used by the MinHash permutations
+_PRIME = (1 << 31) - 1
+
+
+def normalize_statement(text: str) -> str:
+    """
+    Lower-cases, collapses whitespace and drops trailing punctuation, so trivially
+    different spellings of a statement compare equal.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip(".!?;: ")
+
+
+class NearDuplicateFilter:
+    """
+    Drops statements that repeat, exactly or nearly, a statement seen earlier.
+
+    Exact repeats are caught by hashing the normalized text. Near duplicates are found
+    with MinHash signatures over word shingles and locality-sensitive hashing: a
+    statement whose estimated Jaccard similarity to an earlier one is at least
+    `threshold` is dropped. `num_perm` must be a multiple of `bands`; more bands find
+    more candidate pairs at lower similarity.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 2, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+        self._exact = set()
+        self._buckets = {}
+        self._signatures = []
+        self.seen = 0
+        self.exact_dropped = 0
+        self.near_dropped = 0
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        words = normalized.split()
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        # (a * x + b) mod p for every permutation and shingle, minimum per permutation
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        Returns True when `text` repeats an earlier statement; otherwise remembers it.
+        """
+        self.seen += 1
+        normalized = normalize_statement(text)
+        digest = hashlib.sha256(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            self.exact_dropped += 1
+            return True
+
+        signature = self._signature(normalized)
+        keys = list(self._band_keys(signature))
+        candidates = {index for key in keys for index in self._buckets.get(key, ())}
+        for index in candidates:
+            if np.mean(self._signatures[index] == signature) >= self.threshold:
+                self.near_dropped += 1
+                return True
+
+        self._exact.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+        return False
+
+    def filter(self, statements: list) -> list:
+        """
+        Returns the statements that are not duplicates, in order.
+        """
+        return [statement for statement in statements if not self.is_duplicate(statement)]
+
+    def stats(self) -> dict:
+        dropped = self.exact_dropped + self.near_dropped
+        return {
+            "seen": self.seen,
+            "kept": self.seen - dropped,
+            "exact_dropped": self.exact_dropped,
+            "near_dropped": self.near_dropped,
+            "dropped_ratio": dropped / self.seen if self.seen else 0.0,
+        }
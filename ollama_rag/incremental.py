@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Iterator, List, Optional, Set
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Returns the hex SHA-256 digest of a file, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_base_id(namespace: str, text: str) -> str:
+    """
+    Returns the ID of the first occurrence of a text under a namespace.
+    """
+    return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def stable_ids(namespace: str, texts: List[str], seen: Optional[dict] = None) -> List[str]:
+    """
+    Returns deterministic IDs for texts under a namespace (e.g. the source file).
+
+    IDs depend only on the namespace and the text itself, so an unchanged chunk keeps
+    its ID even when chunks before it are added or removed. Repeated texts get an
+    occurrence suffix so IDs stay unique within the namespace; pass the same `seen`
+    dict (base ID -> occurrences so far) across calls when a namespace's texts arrive
+    in several batches.
+    """
+    ids = []
+    seen = {} if seen is None else seen
+    for text in texts:
+        base = chunk_base_id(namespace, text)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        ids.append(base if occurrence == 0 else f"{base}-{occurrence}")
+    return ids
+
+
+def _in_batches(items: list, size: int = 500) -> Iterator[list]:
+    # SQLite limits the number of bound parameters per statement
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class IngestManifest:
+    """
+    Records, per source file, the content hash and the vector store IDs it produced.
+
+    Kept in SQLite with one row per file and one per chunk ID, so updating a file
+    touches only that file's rows. A file can also be recorded batch by batch with
+    `stage` and `commit_source`, keeping memory bounded by the batch size. A JSON
+    manifest from older versions, next to `path`, is imported on first open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        created = not os.path.exists(path)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (source TEXT PRIMARY KEY, sha256 TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " source TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (source, id))"
+        )
+        # IDs seen so far for a file being recorded batch by batch
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS staged ("
+            " source TEXT NOT NULL, id TEXT NOT NULL, base TEXT NOT NULL, PRIMARY KEY (source, id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS staged_base ON staged (source, base)")
+        self._conn.commit()
+
+        legacy_path = f"{os.path.splitext(path)[0]}.json"
+        if created and os.path.exists(legacy_path):
+            with open(legacy_path, "r") as f:
+                for source, entry in json.load(f).get("files", {}).items():
+                    self.update(source, entry["sha256"], entry["ids"])
+            self.save()
+
+    def is_unchanged(self, source: str, digest: str) -> bool:
+        row = self._conn.execute("SELECT sha256 FROM files WHERE source = ?", (source,)).fetchone()
+        return row is not None and row[0] == digest
+
+    def ids_for(self, source: str) -> List[str]:
+        return [chunk_id for (chunk_id,) in self._conn.execute("SELECT id FROM chunks WHERE source = ?", (source,))]
+
+    def known_ids(self, source: str, ids: List[str]) -> Set[str]:
+        """
+        Returns which of `ids` are recorded for the source.
+        """
+        known = set()
+        for batch in _in_batches(ids):
+            placeholders = ",".join("?" * len(batch))
+            known.update(
+                chunk_id for (chunk_id,) in self._conn.execute(
+                    f"SELECT id FROM chunks WHERE source = ? AND id IN ({placeholders})", [source, *batch]
+                )
+            )
+        return known
+
+    def update(self, source: str, digest: str, ids: List[str]):
+        self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO chunks (source, id) VALUES (?, ?)", [(source, chunk_id) for chunk_id in ids]
+        )
+        self._conn.execute("INSERT OR REPLACE INTO files (source, sha256) VALUES (?, ?)", (source, digest))
+
+    def remove(self, source: str):
+        self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+        self._conn.execute("DELETE FROM files WHERE source = ?", (source,))
+
+    def begin_source(self, source: str):
+        """
+        Starts recording a source batch by batch, dropping what an interrupted run staged.
+        """
+        self._conn.execute("DELETE FROM staged WHERE source = ?", (source,))
+
+    def stage(self, source: str, texts: List[str]) -> List[str]:
+        """
+        Returns the stable IDs of the next batch of a source's texts and stages them.
+        Occurrence counts carry over from the earlier batches of the same source.
+        """
+        bases = list(dict.fromkeys(chunk_base_id(source, text) for text in texts))
+        seen = {}
+        for batch in _in_batches(bases):
+            placeholders = ",".join("?" * len(batch))
+            seen.update(self._conn.execute(
+                f"SELECT base, COUNT(*) FROM staged WHERE source = ? AND base IN ({placeholders}) GROUP BY base",
+                [source, *batch],
+            ))
+        ids = stable_ids(source, texts, seen=seen)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO staged (source, id, base) VALUES (?, ?, ?)",
+            [(source, chunk_id, chunk_id.split("-")[0]) for chunk_id in ids],
+        )
+        return ids
+
+    def stale_ids(self, source: str, batch_size: int = 500) -> Iterator[List[str]]:
+        """
+        Yields, in batches, the recorded IDs of a source that were not staged this time.
+        """
+        cursor = self._conn.execute(
+            "SELECT id FROM chunks WHERE source = ? AND id NOT IN (SELECT id FROM staged WHERE source = ?)",
+            (source, source),
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [chunk_id for (chunk_id,) in rows]
+
+    def commit_source(self, source: str, digest: str):
+        """
+        Makes the staged IDs the source's recorded IDs and saves the manifest.
+        """
+        self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+        self._conn.execute("INSERT INTO chunks (source, id) SELECT source, id FROM staged WHERE source = ?", (source,))
+        self._conn.execute("DELETE FROM staged WHERE source = ?", (source,))
+        self._conn.execute("INSERT OR REPLACE INTO files (source, sha256) VALUES (?, ?)", (source, digest))
+        self.save()
+
+    def save(self):
+        """
+        Commits the pending changes in one transaction, so an interrupted run never
+        leaves the manifest half-written.
+        """
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def upsert(vector_store, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None, embeddings=None):
+    """
+    Upserts texts into a Chroma vector store, embedding them unless vectors are given.
+    """
+    if embeddings is None:
+        vector_store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+    else:
+        vector_store._collection.upsert(
+            ids=ids,
+            documents=texts,
+            metadatas=metadatas,
+            embeddings=[list(map(float, vector)) for vector in embeddings],
+        )
+
+
+def sync_source(
+    vector_store,
+    manifest: IngestManifest,
+    source: str,
+    digest: str,
+    texts: List[str],
+    ids: List[str],
+    metadatas: Optional[List[dict]] = None,
+    embeddings=None,
+) -> dict:
+    """
+    Brings the vector store in line with the current chunks of one source file.
+
+    Chunks whose ID is already recorded for the source are left alone, new IDs are
+    upserted and IDs that disappeared are deleted. Precomputed `embeddings` are written
+    as-is instead of re-embedding the texts. The manifest is updated but not saved.
+    """
+    previous = set(manifest.ids_for(source))
+    current = set(ids)
+
+    new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in previous]
+    if new_rows:
+        upsert(
+            vector_store,
+            ids=[ids[i] for i in new_rows],
+            texts=[texts[i] for i in new_rows],
+            metadatas=[metadatas[i] for i in new_rows] if metadatas else None,
+            embeddings=[embeddings[i] for i in new_rows] if embeddings is not None else None,
+        )
+
+    stale = sorted(previous - current)
+    if stale:
+        vector_store.delete(ids=stale)
+
+    manifest.update(source, digest, ids)
+    return {"added": len(new_rows), "deleted": len(stale), "kept": len(ids) - len(new_rows)}
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+
+def response_key(model: str, prompt_template: str, text: str) -> str:
+    """
+    Returns the journal key for one LLM call: a hash of the model, prompt template and input.
+    """
+    payload = json.dumps([model, prompt_template, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseJournal:
+    """
+    Append-only JSONL journal of LLM results, used as a cache across runs.
+
+    Every result is appended and fsynced as soon as it arrives, so a crashed run loses
+    at most the call in flight and a rerun only asks the model for new or changed inputs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash is simply redone
+                        continue
+                    self.entries[record["key"]] = record["value"]
+        self._file = open(path, "a")
+        if self._file.tell() > 0:
+            # Terminate a partial last line so the next record starts on its own line
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def get(self, key: str, *fallback_keys: str) -> Optional[object]:
+        """
+        Returns the value for the first of `key` and `fallback_keys` that is journaled.
+        """
+        with self._lock:
+            value = None
+            for candidate in (key, *fallback_keys):
+                value = self.entries.get(candidate)
+                if value is not None:
+                    break
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def append(self, key: str, value):
+        line = json.dumps({"key": key, "value": value}, ensure_ascii=False)
+        with self._lock:
+            self.entries[key] = value
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -1,8 +1,12 @@
+import argparse
 import os
-from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
-from langchain_experimental.text_splitter import SemanticChunker
 from dotenv import load_dotenv
+from embedding_cache import CachedEmbeddings
+from ollama_embed import BatchedOllamaEmbeddings
+from incremental import IngestManifest, file_sha256, stable_ids, sync_source, upsert
+from semantic_chunker import VectorizedSemanticChunker
+from streaming import ProgressReporter, batched, iter_chunks, iter_files, iter_sentences, read_blocks
 
 # Load environment variables
 load_dotenv()
@@ -10,6 +14,13 @@ load_dotenv()
 # Get environment variables
 OPENAI_EMBED_NAME = os.getenv("OPENAI_EMBED_NAME")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embed_cache/embeddings.sqlite3")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+MANIFEST_FILENAME = "loader_manifest.sqlite3"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+POOLED_CHUNK_EMBEDDINGS = os.getenv("POOLED_CHUNK_EMBEDDINGS", "false").lower() == "true"
 
 # Validate environment variables
 if not OPENAI_EMBED_NAME or not OPENAI_BASE_URL:
@@ -17,30 +28,56 @@ if not OPENAI_EMBED_NAME or not OPENAI_BASE_URL:
 
 try:
     # Initialize embedding model
-    embed_model = OllamaEmbeddings(
+    embed_model = BatchedOllamaEmbeddings(
         model=OPENAI_EMBED_NAME,
-        base_url=OPENAI_BASE_URL
+        base_url=OPENAI_BASE_URL,
+        batch_size=EMBED_BATCH_SIZE,
+        max_in_flight=EMBED_MAX_IN_FLIGHT
+    )
+    # Route every embedding call (chunker and vector store) through the on-disk cache
+    embed_model = CachedEmbeddings(
+        embed_model,
+        cache_path=EMBED_CACHE_PATH,
+        max_entries=EMBED_CACHE_MAX_ENTRIES
     )
 except Exception as e:
     raise RuntimeError(f"Failed to initialize Ollama embeddings: {e}")
 
-def create_and_persist_vector_store(file_path: str, persist_directory: str):
+def create_and_persist_vector_store(file_path: str, persist_directory: str, incremental: bool = False, pooled_embeddings: bool = POOLED_CHUNK_EMBEDDINGS):
     """
     Reads a file, splits the text into chunks, embeds it, and persists the vector store.
+
+    In incremental mode every chunk gets a deterministic ID and a manifest of source
+    file hashes is kept next to the store: unchanged files are skipped, new chunks are
+    upserted and chunks that no longer exist are deleted.
+
+    With `pooled_embeddings` each chunk is stored with the mean of its sentence vectors
+    from the chunker, so the text is embedded once instead of twice.
     """
     try:
+        if incremental:
+            return update_vector_store(file_path, persist_directory, pooled_embeddings)
+
         # Read the file content
         with open(file_path, "r") as f:
             text = f.read()
 
         # Initialize the text splitter
-        text_splitter = SemanticChunker(embed_model)
-        chunks = text_splitter.split_text(text)
+        text_splitter = VectorizedSemanticChunker(embed_model)
+        chunks, vectors = text_splitter.split_text_with_embeddings(text)
 
         # Create the vector store and persist it
-        vector_store = Chroma.from_texts(chunks, embed_model, persist_directory=persist_directory)
+        vector_store = Chroma(persist_directory=persist_directory, embedding_function=embed_model)
+        upsert(
+            vector_store,
+            ids=stable_ids(file_path, chunks),
+            texts=chunks,
+            metadatas=chunk_metadatas(file_path, chunks),
+            embeddings=vectors if pooled_embeddings else None
+        )
 
         print(f"Vector store created and persisted at: {persist_directory}")
+        print(f"Embedding cache stats: {embed_model.stats()}")
         return vector_store
 
     except FileNotFoundError:
@@ -48,13 +85,130 @@ def create_and_persist_vector_store(file_path: str, persist_directory: str):
     except Exception as e:
         raise RuntimeError(f"An error occurred while creating the vector store: {e}")
 
+def chunk_metadatas(file_path: str, chunks: list):
+    """
+    Builds the metadata stored alongside each chunk.
+    """
+    return [{"source_file": file_path, "length": len(chunk)} for chunk in chunks]
+
+def update_vector_store(file_path: str, persist_directory: str, pooled_embeddings: bool = POOLED_CHUNK_EMBEDDINGS):
+    """
+    Incrementally re-indexes one file into the persisted vector store.
+    """
+    vector_store = Chroma(persist_directory=persist_directory, embedding_function=embed_model)
+    manifest = IngestManifest(os.path.join(persist_directory, MANIFEST_FILENAME))
+
+    digest = file_sha256(file_path)
+    if manifest.is_unchanged(file_path, digest):
+        print(f"Skipping unchanged file: {file_path}")
+        return vector_store
+
+    with open(file_path, "r") as f:
+        text = f.read()
+
+    text_splitter = VectorizedSemanticChunker(embed_model)
+    chunks, vectors = text_splitter.split_text_with_embeddings(text)
+
+    stats = sync_source(
+        vector_store,
+        manifest,
+        source=file_path,
+        digest=digest,
+        texts=chunks,
+        ids=stable_ids(file_path, chunks),
+        metadatas=chunk_metadatas(file_path, chunks),
+        embeddings=vectors if pooled_embeddings else None
+    )
+    manifest.save()
+
+    print(f"Incrementally updated {file_path}: {stats}")
+    print(f"Embedding cache stats: {embed_model.stats()}")
+    return vector_store
+
+def ingest_directory(patterns: list, persist_directory: str, batch_size: int = INGEST_BATCH_SIZE, pooled_embeddings: bool = POOLED_CHUNK_EMBEDDINGS):
+    """
+    Streams every file matched by the given directories or glob patterns into the vector store.
+
+    Each file flows through read -> sentence split -> chunk -> embed -> upsert as a
+    generator pipeline, so peak memory is bounded by the batch size rather than the
+    corpus size. Files are indexed incrementally with the same manifest as
+    `update_vector_store`; a file's chunk IDs are staged in the manifest batch by
+    batch instead of being held in memory.
+    """
+    vector_store = Chroma(persist_directory=persist_directory, embedding_function=embed_model)
+    manifest = IngestManifest(os.path.join(persist_directory, MANIFEST_FILENAME))
+    text_splitter = VectorizedSemanticChunker(embed_model)
+    progress = ProgressReporter()
+
+    for file_path in iter_files(patterns):
+        digest = file_sha256(file_path)
+        if manifest.is_unchanged(file_path, digest):
+            progress.file_done(file_path)
+            continue
+
+        manifest.begin_source(file_path)
+        chunks = iter_chunks(
+            iter_sentences(read_blocks(file_path)),
+            text_splitter,
+            with_embeddings=True
+        )
+
+        for batch in batched(chunks, batch_size):
+            texts = [chunk for chunk, _ in batch]
+            ids = manifest.stage(file_path, texts)
+            known = manifest.known_ids(file_path, ids)
+            new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in known]
+            if new_rows:
+                new_texts = [texts[i] for i in new_rows]
+                upsert(
+                    vector_store,
+                    ids=[ids[i] for i in new_rows],
+                    texts=new_texts,
+                    metadatas=chunk_metadatas(file_path, new_texts),
+                    embeddings=[batch[i][1] for i in new_rows] if pooled_embeddings else None
+                )
+            progress.chunks_done(len(batch))
+
+        for stale in manifest.stale_ids(file_path, batch_size):
+            vector_store.delete(ids=stale)
+
+        # Save after every file so an interrupted run resumes where it stopped
+        manifest.commit_source(file_path, digest)
+        progress.file_done(file_path)
+
+    print(f"Ingest finished: {progress.summary()}")
+    print(f"Embedding cache stats: {embed_model.stats()}")
+    return vector_store
+
 if __name__ == "__main__":
-    file_path = "gcp_architect_guide.txt"
-    persist_directory = "./chroma_db"
+    parser = argparse.ArgumentParser(description="Index text files into the Chroma vector store.")
+    parser.add_argument("paths", nargs="*", default=["gcp_architect_guide.txt"],
+                        help="Files, directories or glob patterns to index")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream files through a bounded-memory batch pipeline")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--pooled-embeddings", action="store_true", default=POOLED_CHUNK_EMBEDDINGS,
+                        help="Store pooled sentence vectors instead of re-embedding each chunk")
+    args = parser.parse_args()
 
-    # Validate file path
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"The file {file_path} does not exist.")
+    if args.stream:
+        vector_store = ingest_directory(
+            args.paths,
+            args.persist_directory,
+            batch_size=args.batch_size,
+            pooled_embeddings=args.pooled_embeddings
+        )
+    else:
+        for file_path in args.paths:
+            # Validate file path
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"The file {file_path} does not exist.")
 
-    # Create and persist vector store
-    vector_store = create_and_persist_vector_store(file_path, persist_directory)
\ No newline at end of file
+            # Create and persist vector store
+            vector_store = create_and_persist_vector_store(
+                file_path,
+                args.persist_directory,
+                incremental=True,
+                pooled_embeddings=args.pooled_embeddings
+            )
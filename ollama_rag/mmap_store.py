@@ -0,0 +1,396 @@
+import argparse
+import json
+import os
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+OFFSETS_FILE = "offsets.npy"
+RECORDS_FILE = "records.jsonl"
+COLUMNS_FILE = "metadata_columns.json"
+COLUMNS_DIRECTORY = "columns"
+
+# Longer metadata strings (e.g. parent chunk text) are not kept as filter columns
+MAX_COLUMN_STRING = 256
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Read-only vector store over a memory-mapped matrix of normalized vectors.
+
+    Vectors are stored as float16 or as int8 with a per-row scale, texts and full
+    metadata live in a JSONL sidecar read by offset, and short scalar metadata is
+    stored as memory-mapped columns for filtering: numbers as float64 (NaN when
+    missing), strings dictionary-encoded as int32 codes (-1 when missing) into a
+    sorted vocabulary. Top-k is a NumPy dot product over the rows that pass the
+    metadata mask, so loading costs almost nothing and a query scoped to one document
+    only touches that document's rows. Filters use Chroma's `where` syntax.
+    """
+
+    def __init__(self, directory: str, embedding_function: Optional[Embeddings] = None, block_rows: int = 65536):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.block_rows = block_rows
+
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        scales_path = os.path.join(directory, SCALES_FILE)
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._records_fd = os.open(os.path.join(directory, RECORDS_FILE), os.O_RDONLY)
+
+        with open(os.path.join(directory, COLUMNS_FILE), "r") as f:
+            columns = json.load(f)
+        if any(isinstance(spec, list) for spec in columns.values()):
+            raise ValueError(f"{directory} uses the old in-memory column format; re-export it with from_chroma.")
+        # name -> (values, vocab); vocab is None for numeric columns
+        self.columns = {}
+        for name, spec in columns.items():
+            values = np.load(os.path.join(directory, COLUMNS_DIRECTORY, spec["values"]), mmap_mode="r")
+            vocab = np.load(os.path.join(directory, COLUMNS_DIRECTORY, spec["vocab"]), mmap_mode="r") if spec["kind"] == "string" else None
+            self.columns[name] = (values, vocab)
+        self._masks = {}
+        self._masks_lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def fingerprint(self) -> tuple:
+        """
+        Returns a value that changes whenever the store is rebuilt.
+        """
+        return (os.stat(os.path.join(self.directory, VECTORS_FILE)).st_mtime_ns, len(self))
+
+    # Building
+
+    @classmethod
+    def build(
+        cls,
+        directory: str,
+        rows: Iterable[Tuple[str, str, list, dict]],
+        count: int,
+        dim: int,
+        dtype: str = "float16",
+    ) -> None:
+        """
+        Writes a store from `count` (id, text, vector, metadata) rows, streaming them to disk.
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+
+        os.makedirs(directory, exist_ok=True)
+        vectors = np.lib.format.open_memmap(
+            os.path.join(directory, VECTORS_FILE), mode="w+", dtype=np.dtype(dtype), shape=(count, dim)
+        )
+        scales = np.empty(count, dtype=np.float32) if dtype == "int8" else None
+        # One extra offset marks the end of the last record
+        offsets = np.empty(count + 1, dtype=np.int64)
+        # name -> float64 values for numeric columns, or (provisional codes, {string: code})
+        columns = {}
+
+        written = 0
+        with open(os.path.join(directory, RECORDS_FILE), "wb") as records:
+            for row, (doc_id, text, vector, metadata) in enumerate(rows):
+                vector = np.asarray(vector, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm:
+                    vector = vector / norm
+                if scales is not None:
+                    scale = float(np.abs(vector).max()) / 127 or 1.0
+                    vectors[row] = np.round(vector / scale).astype(np.int8)
+                    scales[row] = scale
+                else:
+                    vectors[row] = vector.astype(np.float16)
+
+                metadata = metadata or {}
+                offsets[row] = records.tell()
+                records.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata}).encode("utf-8") + b"\n")
+
+                for name, value in metadata.items():
+                    if isinstance(value, str):
+                        if len(value) > MAX_COLUMN_STRING:
+                            continue
+                        if name not in columns:
+                            columns[name] = (np.full(count, -1, dtype=np.int32), {})
+                        column = columns[name]
+                        if isinstance(column, tuple):
+                            codes, vocab = column
+                            codes[row] = vocab.setdefault(value, len(vocab))
+                    elif isinstance(value, (int, float, bool)):
+                        if name not in columns:
+                            columns[name] = np.full(count, np.nan, dtype=np.float64)
+                        column = columns[name]
+                        # A value of the other type than the column's first one counts as missing
+                        if not isinstance(column, tuple):
+                            column[row] = float(value)
+                written += 1
+
+            offsets[count] = records.tell()
+
+        if written != count:
+            raise ValueError(f"Expected {count} rows, got {written}")
+
+        vectors.flush()
+        del vectors
+        np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+        if scales is not None:
+            np.save(os.path.join(directory, SCALES_FILE), scales)
+        elif os.path.exists(os.path.join(directory, SCALES_FILE)):
+            os.remove(os.path.join(directory, SCALES_FILE))
+        cls._write_columns(directory, columns)
+
+    @staticmethod
+    def _write_columns(directory: str, columns: dict) -> None:
+        columns_directory = os.path.join(directory, COLUMNS_DIRECTORY)
+        os.makedirs(columns_directory, exist_ok=True)
+        specs = {}
+        for index, (name, column) in enumerate(columns.items()):
+            # Files are numbered, since metadata names need not be valid file names
+            if isinstance(column, tuple):
+                codes, vocab = column
+                strings = sorted(vocab)
+                # Re-number the codes so they follow the sorted vocabulary
+                remap = np.empty(len(strings) + 1, dtype=np.int32)
+                remap[-1] = -1
+                for code, string in enumerate(strings):
+                    remap[vocab[string]] = code
+                np.save(os.path.join(columns_directory, f"{index}.codes.npy"), remap[codes])
+                np.save(os.path.join(columns_directory, f"{index}.vocab.npy"), np.array(strings, dtype=str))
+                specs[name] = {"kind": "string", "values": f"{index}.codes.npy", "vocab": f"{index}.vocab.npy"}
+            else:
+                np.save(os.path.join(columns_directory, f"{index}.npy"), column)
+                specs[name] = {"kind": "numeric", "values": f"{index}.npy"}
+        with open(os.path.join(directory, COLUMNS_FILE), "w") as f:
+            json.dump(specs, f)
+
+    @classmethod
+    def from_chroma(cls, chroma_store, directory: str, dtype: str = "float16", batch_size: int = 5000, embedding_function: Optional[Embeddings] = None):
+        """
+        Exports a persisted Chroma collection into a memory-mapped store.
+        """
+        collection = chroma_store._collection
+        count = collection.count()
+        if count == 0:
+            raise ValueError("The Chroma collection is empty.")
+        dim = len(collection.get(limit=1, include=["embeddings"])["embeddings"][0])
+
+        def rows():
+            for offset in range(0, count, batch_size):
+                batch = collection.get(
+                    limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+                )
+                yield from zip(batch["ids"], batch["documents"], batch["embeddings"], batch["metadatas"])
+
+        cls.build(directory, rows(), count, dim, dtype)
+        return cls(directory, embedding_function=embedding_function)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "./mmap_store",
+        dtype: str = "float16",
+        **kwargs: Any,
+    ) -> "MmapVectorStore":
+        vectors = embedding.embed_documents(list(texts))
+        ids = ids or [str(i) for i in range(len(texts))]
+        metadatas = metadatas or [{} for _ in texts]
+        cls.build(directory, zip(ids, texts, vectors, metadatas), len(texts), len(vectors[0]), dtype)
+        return cls(directory, embedding_function=embedding)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("MmapVectorStore is read-only; rebuild it with from_chroma or from_texts.")
+
+    # Filtering
+
+    @staticmethod
+    def _encode(vocab: np.ndarray, value) -> float:
+        """
+        Maps a string to its code in a sorted vocabulary, or to a half-step between
+        codes when absent, so that comparisons against the codes keep string order.
+        """
+        if not isinstance(value, str):
+            return np.nan
+        position = int(np.searchsorted(vocab, value))
+        if position < len(vocab) and vocab[position] == value:
+            return position
+        return position - 0.5
+
+    def _condition_mask(self, field: str, condition) -> np.ndarray:
+        column = self.columns.get(field)
+        if column is None:
+            return np.zeros(len(self), dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        values, vocab = column
+        if vocab is None:
+            present = ~np.isnan(values)
+
+            def encode(value):
+                return float(value) if isinstance(value, (int, float)) else np.nan
+        else:
+            present = values >= 0
+
+            def encode(value):
+                return self._encode(vocab, value)
+
+        # Rows missing the field never match, as in Chroma
+        mask = present.copy()
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                matches = np.isin(values, [encode(item) for item in value])
+                mask &= matches if operator == "$in" else ~matches
+                continue
+
+            value = encode(value)
+            if operator == "$eq":
+                mask &= values == value
+            elif operator == "$ne":
+                mask &= values != value
+            elif operator == "$gt":
+                mask &= values > value
+            elif operator == "$gte":
+                mask &= values >= value
+            elif operator == "$lt":
+                mask &= values < value
+            elif operator == "$lte":
+                mask &= values <= value
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        masks = []
+        for key, value in where.items():
+            if key == "$and":
+                masks.append(np.logical_and.reduce([self._where_mask(clause) for clause in value]))
+            elif key == "$or":
+                masks.append(np.logical_or.reduce([self._where_mask(clause) for clause in value]))
+            else:
+                masks.append(self._condition_mask(key, value))
+        return np.logical_and.reduce(masks)
+
+    def _mask(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        with self._masks_lock:
+            mask = self._masks.get(key)
+        if mask is None:
+            mask = self._where_mask(where)
+            with self._masks_lock:
+                # Masks are cheap to keep and filters repeat a lot, so remember a few
+                if len(self._masks) >= 64:
+                    self._masks.pop(next(iter(self._masks)))
+                self._masks[key] = mask
+        return mask
+
+    # Search
+
+    def _rows(self, rows) -> np.ndarray:
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return block
+
+    def _top_k(self, queries: np.ndarray, k: int, where: Optional[dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (rows, similarities) of shape (queries, k'), best first.
+
+        Rows are scored `block_rows` at a time and only a running top k per query is
+        kept, so memory follows the block size rather than the store size.
+        """
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        mask = self._mask(where)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), self.block_rows):
+            end = min(start + self.block_rows, len(self))
+            if mask is None:
+                rows = np.arange(start, end)
+                scores = queries @ self._rows(slice(start, end)).T
+            else:
+                rows = start + np.flatnonzero(mask[start:end])
+                if len(rows) == 0:
+                    continue
+                scores = queries @ self._rows(rows).T
+
+            # Merge this block's best rows into the running top k
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = rows[top]
+            else:
+                rows = np.broadcast_to(rows, scores.shape)
+            merged_rows = np.concatenate([best_rows, rows], axis=1)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            if merged_scores.shape[1] > k:
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                merged_rows = np.take_along_axis(merged_rows, top, axis=1)
+                merged_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_rows, best_scores = merged_rows, merged_scores
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _document(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        # pread does not move a shared file position, so concurrent searches are safe
+        record = json.loads(os.pread(self._records_fd, end - start, start))
+        return Document(page_content=record["text"], metadata=record["metadata"], id=record["id"])
+
+    def similarity_search_by_vectors_with_relevance_scores(self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Batched search; returns per query (document, cosine distance) pairs, nearest first.
+        """
+        rows, similarities = self._top_k(np.asarray(embeddings, dtype=np.float32), k, filter)
+        return [
+            [(self._document(row), float(1.0 - similarity)) for row, similarity in zip(query_rows, query_similarities)]
+            for query_rows, query_similarities in zip(rows, similarities)
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors_with_relevance_scores([embedding], k, filter)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to search by text.")
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Distances are cosine distances of normalized vectors
+        return lambda distance: 1.0 - distance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a persisted Chroma collection to a memory-mapped store.")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--output", default="./mmap_db")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+
+    store = MmapVectorStore.from_chroma(Chroma(persist_directory=args.persist_directory), args.output, args.dtype)
+    print(f"Exported {len(store)} vectors ({args.dtype}) to {args.output}")
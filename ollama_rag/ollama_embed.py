@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """
+    Embedding client for Ollama's batch endpoint (`POST /api/embed`).
+
+    Texts are packed `batch_size` at a time into each request, up to `max_in_flight`
+    requests run concurrently over a pooled HTTP connection, failed requests are
+    retried with exponential backoff, and vectors are returned in input order. It is
+    a drop-in replacement for `OllamaEmbeddings(model=..., base_url=...)`.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        base_url: str = "http://localhost:11434",
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 120.0,
+        keep_alive: Optional[str] = None,
+    ):
+        self.model = model
+        # The native API lives at the server root, not under the OpenAI-compatible /v1 prefix
+        self.base_url = base_url.rstrip("/").removesuffix("/v1")
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_in_flight,
+                max_keepalive_connections=max_in_flight,
+            ),
+        )
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight, thread_name_prefix="ollama-embed"
+                )
+            return self._executor
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        payload = {"model": self.model, "input": texts}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._client.post("/api/embed", json=payload)
+            except httpx.TransportError as e:
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    break
+                error = f"HTTP {response.status_code}: {response.text}"
+
+            if attempt >= self.max_retries:
+                raise RuntimeError(f"Ollama embed request failed after {attempt + 1} attempts: {error}")
+            time.sleep(self.backoff * (2 ** attempt))
+
+        if response.is_error:
+            raise RuntimeError(f"Ollama embed request failed: HTTP {response.status_code}: {response.text}")
+
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise RuntimeError(
+                f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs"
+            )
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts in concurrent batched requests, preserving input order.
+        """
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        vectors = []
+        # Executor.map yields results in submission order
+        for batch_vectors in self._get_executor().map(self._embed_batch, batches):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._client.close()
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, Tuple
+
+# File the parent chunks live in, next to the vector store
+PARENT_STORE_FILENAME = "parents.sqlite3"
+
+
+class ParentStore:
+    """
+    SQLite store of parent chunk texts keyed by chunk ID.
+
+    Indexed statements reference their parent by ID instead of carrying its text in
+    their metadata, so each parent is stored once and fetched once at retrieval time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            " id TEXT PRIMARY KEY,"
+            " source_file TEXT,"
+            " text TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS parents_source_file ON parents (source_file)"
+        )
+        self._conn.commit()
+
+    def put_many(self, parents: Iterable[Tuple[str, str, str]]):
+        """
+        Inserts or replaces (id, source_file, text) rows.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parents (id, source_file, text) VALUES (?, ?, ?)",
+                list(parents),
+            )
+            self._conn.commit()
+
+    def get_many(self, ids: List[str]) -> dict:
+        """
+        Returns {id: text} for the IDs that exist.
+        """
+        found = {}
+        unique = list(dict.fromkeys(ids))
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id, text FROM parents WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def retain_source(self, source_file: str, keep_ids: Iterable[str]) -> int:
+        """
+        Deletes a source's parents that are not in `keep_ids` and returns how many went.
+        """
+        keep = set(keep_ids)
+        with self._lock:
+            stale = [
+                (parent_id,)
+                for (parent_id,) in self._conn.execute(
+                    "SELECT id FROM parents WHERE source_file = ?", (source_file,)
+                )
+                if parent_id not in keep
+            ]
+            self._conn.executemany("DELETE FROM parents WHERE id = ?", stale)
+            self._conn.commit()
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_parent_store(persist_directory: str):
+    """
+    Opens the parent store next to a vector store, or returns None when there is none.
+    """
+    path = os.path.join(persist_directory, PARENT_STORE_FILENAME)
+    return ParentStore(path) if os.path.exists(path) else None
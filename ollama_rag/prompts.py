@@ -0,0 +1,56 @@
+import os
+
+HUB_PROMPT_NAME = "langchain-ai/retrieval-qa-chat"
+
+# Vendored copy of the langchain-ai/retrieval-qa-chat hub prompt
+RETRIEVAL_QA_SYSTEM = (
+    "Answer any use questions based solely on the context below:\n\n"
+    "<context>\n{context}\n</context>"
+)
+
+
+def vendored_retrieval_qa_prompt():
+    """
+    Builds the retrieval QA chat prompt locally, without touching the network.
+    """
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    return ChatPromptTemplate.from_messages([
+        ("system", RETRIEVAL_QA_SYSTEM),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+    ])
+
+
+def load_retrieval_qa_prompt(source: str = "local", cache_path: str = "./prompt_cache/retrieval-qa-chat.json"):
+    """
+    Loads the retrieval QA chat prompt.
+
+    `local` uses the vendored copy, `hub` always pulls from the LangChain hub and
+    `cached` pulls once, stores the result at `cache_path` and reads it from there on
+    later starts. If the hub cannot be reached the vendored copy is used instead.
+    """
+    if source == "local":
+        return vendored_retrieval_qa_prompt()
+
+    from langchain_core.load import dumps, loads
+
+    if source == "cached" and os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            return loads(f.read())
+
+    try:
+        from langchain import hub
+
+        prompt = hub.pull(HUB_PROMPT_NAME)
+    except Exception as e:
+        print(f"Could not pull {HUB_PROMPT_NAME} from the hub ({e}); using the vendored prompt.")
+        return vendored_retrieval_qa_prompt()
+
+    if source == "cached":
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w") as f:
+            f.write(dumps(prompt))
+    return prompt
@@ -1,11 +1,14 @@
+import argparse
+import asyncio
+import json
 import os
-from langchain_ollama import OllamaLLM
-from langchain.chains import create_retrieval_chain
-from langchain import hub
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
+import threading
+import time
+from contextlib import nullcontext
+from functools import lru_cache
 from dotenv import load_dotenv
+from prompts import load_retrieval_qa_prompt
+from timing import StageTimer
 
 # Load environment variables
 load_dotenv()
@@ -17,67 +20,527 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL_NAME_LARGE = os.getenv('OPENAI_MODEL_NAME_LARGE')
 OPENAI_EMBED_NAME = os.getenv('OPENAI_EMBED_NAME')
 OPENAI_BASE_URL_RAG = os.getenv('OPENAI_BASE_URL_RAG')
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+EMBED_MAX_IN_FLIGHT = int(os.getenv('EMBED_MAX_IN_FLIGHT', '4'))
+RAG_PROMPT_SOURCE = os.getenv('RAG_PROMPT_SOURCE', 'local')
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+RAG_ANSWER_CACHE = os.getenv('RAG_ANSWER_CACHE', 'false').lower() == 'true'
+RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv('RAG_ANSWER_CACHE_THRESHOLD', '0.95'))
+RAG_ANSWER_CACHE_TTL = float(os.getenv('RAG_ANSWER_CACHE_TTL', '3600'))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv('RAG_ANSWER_CACHE_SIZE', '1024'))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', '0'))
+RAG_CONTEXT_FETCH_K = int(os.getenv('RAG_CONTEXT_FETCH_K', '16'))
+RAG_VECTOR_BACKEND = os.getenv('RAG_VECTOR_BACKEND', 'chroma')
+RAG_MMAP_DIRECTORY = os.getenv('RAG_MMAP_DIRECTORY', './mmap_db')
 
-# Initialize embedding model
-embed_model = OllamaEmbeddings(
+# The langchain stack is imported and the models are built on first use, so that
+# importing this module and answering --help stay fast.
+
+@lru_cache(maxsize=None)
+def get_embed_model():
+    """
+    Returns the shared embedding model, creating it on first use.
+    """
+    from ollama_embed import BatchedOllamaEmbeddings
+
+    return BatchedOllamaEmbeddings(
         model=OPENAI_EMBED_NAME,
-        base_url=OPENAI_BASE_URL_RAG
-)
+        base_url=OPENAI_BASE_URL_RAG,
+        batch_size=EMBED_BATCH_SIZE,
+        max_in_flight=EMBED_MAX_IN_FLIGHT,
+        keep_alive=OLLAMA_KEEP_ALIVE
+    )
 
-# Initialize language model
-llm = OllamaLLM(
-    verbose=True,
-    model=OPENAI_MODEL_NAME,
-    base_url=OPENAI_BASE_URL_RAG
-)
+@lru_cache(maxsize=None)
+def get_llm():
+    """
+    Returns the shared language model, creating it on first use.
+    """
+    from langchain_ollama import OllamaLLM
 
-def load_persisted_vector_store(persist_directory: str):
+    return OllamaLLM(
+        verbose=True,
+        model=OPENAI_MODEL_NAME,
+        base_url=OPENAI_BASE_URL_RAG,
+        keep_alive=OLLAMA_KEEP_ALIVE
+    )
+
+def warm_up_models(keep_alive: str = OLLAMA_KEEP_ALIVE):
     """
-    Loads a persisted vector store from the given directory.
+    Preloads the LLM and the embedding model on the Ollama host and keeps them resident.
+
+    Both loads run in parallel; an empty generate request loads the model without
+    producing any tokens.
     """
-    vector_store = Chroma(
-        persist_directory=persist_directory, 
-        embedding_function=embed_model
+    import httpx
+
+    base_url = OPENAI_BASE_URL_RAG.rstrip("/")
+    errors = []
+
+    def load_llm():
+        try:
+            httpx.post(
+                f"{base_url}/api/generate",
+                json={"model": OPENAI_MODEL_NAME, "keep_alive": keep_alive},
+                timeout=300.0
+            ).raise_for_status()
+        except Exception as e:
+            errors.append(f"LLM warm-up failed: {e}")
+
+    def load_embeddings():
+        try:
+            get_embed_model().embed_query("warm-up")
+        except Exception as e:
+            errors.append(f"Embedding warm-up failed: {e}")
+
+    threads = [threading.Thread(target=load_llm), threading.Thread(target=load_embeddings)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for error in errors:
+        print(error)
+
+def open_vector_store(persist_directory: str, backend: str = RAG_VECTOR_BACKEND):
+    """
+    Opens the persisted vector store.
+
+    `chroma` opens the Chroma collection in `persist_directory`; `mmap` opens the
+    read-only memory-mapped export in RAG_MMAP_DIRECTORY (see `mmap_store.py`).
+    """
+    if backend == "mmap":
+        from mmap_store import MmapVectorStore
+
+        return MmapVectorStore(RAG_MMAP_DIRECTORY, embedding_function=get_embed_model())
+
+    from langchain_chroma import Chroma
+
+    return Chroma(
+        persist_directory=persist_directory,
+        embedding_function=get_embed_model()
     )
-    
+
+def build_metadata_filter(source_file=None, min_length: int = None, max_length: int = None, **equals):
+    """
+    Builds a Chroma `where` clause from simple metadata constraints.
+
+    `source_file` may be a single file or a list of files, `min_length`/`max_length`
+    bound the `length` metadata and any other keyword must match exactly. A dict value
+    is an operator condition such as `{"$gte": 2020}` and is used as is, and top-level
+    `$and`/`$or` clauses are kept as given. All constraints are combined with `$and`.
+    Returns None when there is nothing to filter on.
+    """
+    conditions = [{key: equals.pop(key)} for key in list(equals) if key.startswith("$")]
+    if isinstance(source_file, dict):
+        conditions.append({"source_file": source_file})
+    elif isinstance(source_file, (list, tuple)):
+        conditions.append({"source_file": {"$in": list(source_file)}})
+    elif source_file is not None:
+        conditions.append({"source_file": {"$eq": source_file}})
+    if min_length is not None:
+        conditions.append({"length": {"$gte": min_length}})
+    if max_length is not None:
+        conditions.append({"length": {"$lte": max_length}})
+    for key, value in equals.items():
+        conditions.append({key: value if isinstance(value, dict) else {"$eq": value}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def load_persisted_vector_store(persist_directory: str, search_filter: dict = None, k: int = None):
+    """
+    Loads a persisted vector store from the given directory.
+
+    `search_filter` is a Chroma `where` clause applied inside the vector search.
+    """
+    vector_store = open_vector_store(persist_directory)
+
+    search_kwargs = {}
+    if search_filter:
+        search_kwargs["filter"] = search_filter
+    if k:
+        search_kwargs["k"] = k
+
     return vector_store.as_retriever(
         # search_type="similarity_score_threshold",
         # search_kwargs={
-        #     "k": 3, 
+        #     "k": 3,
         #    "score_threshold": 0.5
         # },
+        search_kwargs=search_kwargs,
     )
 
-def create_retrieval_qa_chain(persist_directory: str):
+def create_retrieval_qa_chain(persist_directory: str, prompt_source: str = RAG_PROMPT_SOURCE, timer: StageTimer = None, search_filter: dict = None, context_token_budget: int = RAG_CONTEXT_TOKEN_BUDGET):
     """
     Creates a retrieval QA chain from a persisted vector store.
+
+    `prompt_source` selects the vendored prompt (`local`), a disk-cached hub pull
+    (`cached`) or a fresh hub pull (`hub`). Pass a `StageTimer` to get a breakdown
+    of where startup time goes, and a `search_filter` to scope retrieval by metadata.
+    A non-zero `context_token_budget` packs the retrieved documents into that many
+    prompt tokens (see `context_packing.pack_context`). Retrieved statements get their
+    parent chunk text attached from the parent store (see `context_packing.expand_parents`).
     """
-    retriever = load_persisted_vector_store(persist_directory)
+    timer = timer or StageTimer()
 
-    retrieval_qa_chat_prompt = hub.pull("langchain-ai/retrieval-qa-chat")
-    combine_docs_chain = create_stuff_documents_chain(
-        llm, retrieval_qa_chat_prompt,
-    )
-    retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
+    with timer.stage("import langchain"):
+        from langchain.chains import create_retrieval_chain
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+
+    with timer.stage("open vector store"):
+        from functools import partial
+        from langchain_core.runnables import RunnableLambda
+        from context_packing import expand_parents, pack_documents
+        from parent_store import open_parent_store
+
+        parent_store = open_parent_store(persist_directory)
+        # create_retrieval_chain hands a plain Runnable the whole input dict,
+        # so pick out the question before it reaches the retriever
+        retriever = RunnableLambda(lambda inputs: inputs["input"]) | load_persisted_vector_store(
+            persist_directory, search_filter, k=RAG_CONTEXT_FETCH_K if context_token_budget else None
+        ) | RunnableLambda(partial(expand_parents, parent_store=parent_store))
+        if context_token_budget:
+            retriever = retriever | RunnableLambda(partial(
+                pack_documents,
+                token_budget=context_token_budget,
+                parent_store=parent_store,
+            ))
+
+    with timer.stage(f"load prompt ({prompt_source})"):
+        retrieval_qa_chat_prompt = load_retrieval_qa_prompt(prompt_source)
+
+    with timer.stage("build llm"):
+        llm = get_llm()
+
+    with timer.stage("build chain"):
+        combine_docs_chain = create_stuff_documents_chain(
+            llm, retrieval_qa_chat_prompt,
+        )
+        retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
     return retrieval_chain
 
+def collection_fingerprint(persist_directory: str, vector_store) -> tuple:
+    """
+    Returns a cheap value that changes whenever the persisted collection is written to.
+    """
+    if hasattr(vector_store, "fingerprint"):
+        return vector_store.fingerprint()
+    sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+    mtime = os.stat(sqlite_path).st_mtime_ns if os.path.exists(sqlite_path) else None
+    return (mtime, vector_store._collection.count())
+
+def create_answer_cache(persist_directory: str, vector_store):
+    """
+    Builds the semantic answer cache, invalidated when the collection changes.
+    """
+    from answer_cache import SemanticAnswerCache
+
+    return SemanticAnswerCache(
+        threshold=RAG_ANSWER_CACHE_THRESHOLD,
+        max_entries=RAG_ANSWER_CACHE_SIZE,
+        ttl=RAG_ANSWER_CACHE_TTL,
+        version_fn=lambda: collection_fingerprint(persist_directory, vector_store)
+    )
+
+class RagPipeline:
+    """
+    Retrieval QA split into explicit stages: embed the query, retrieve, generate.
+
+    The vector store, LLM and prompt are built once and shared across calls, and each
+    answer carries its per-stage latency, so the pipeline can back a long-running
+    service. Calls are thread-safe. With `answer_cache` enabled, questions close
+    enough to an earlier one are answered from memory without retrieval or generation.
+    With a non-zero `context_token_budget`, `fetch_k` hits are retrieved and packed
+    into that many prompt tokens instead of stuffing the top k verbatim. Every
+    retrieved statement gets its parent chunk text under `context`, resolved from the
+    parent store next to the vector store with one lookup per retrieval.
+    """
+
+    def __init__(self, persist_directory: str, k: int = 4, prompt_source: str = RAG_PROMPT_SOURCE, answer_cache: bool = RAG_ANSWER_CACHE, context_token_budget: int = RAG_CONTEXT_TOKEN_BUDGET, fetch_k: int = RAG_CONTEXT_FETCH_K):
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from parent_store import open_parent_store
+
+        self.k = k
+        self.context_token_budget = context_token_budget
+        self.fetch_k = fetch_k
+        self.embeddings = get_embed_model()
+        self.vector_store = open_vector_store(persist_directory)
+        self.parent_store = open_parent_store(persist_directory)
+        self.combine_docs_chain = create_stuff_documents_chain(
+            get_llm(), load_retrieval_qa_prompt(prompt_source),
+        )
+        self.answer_cache = create_answer_cache(persist_directory, self.vector_store) if answer_cache else None
+
+    def cache_scope(self, k: int = None, search_filter: dict = None) -> str:
+        """
+        Serializes the request options that change an answer, for the answer cache.
+        """
+        return json.dumps({"k": k or self.k, "filter": search_filter}, sort_keys=True)
+
+    def retrieval_k(self, k: int = None) -> int:
+        """
+        Number of hits to fetch: k, or more when they are packed into a token budget.
+        """
+        k = k or self.k
+        return max(self.fetch_k, k) if self.context_token_budget else k
+
+    def embed_query(self, question: str):
+        return self.embeddings.embed_query(question)
+
+    def expand_parents(self, documents: list) -> list:
+        """
+        Attaches the parent chunk text of every retrieved statement, in one lookup.
+        """
+        from context_packing import expand_parents
+
+        return expand_parents(documents, self.parent_store)
+
+    def _expand_hits(self, hits: list) -> list:
+        documents = self.expand_parents([document for document, _ in hits])
+        return [(document, score) for document, (_, score) in zip(documents, hits)]
+
+    def retrieve(self, query_vector, k: int = None, search_filter: dict = None):
+        """
+        Returns the k nearest documents, with the metadata filter applied inside the search.
+        """
+        return self.expand_parents(self.vector_store.similarity_search_by_vector(
+            query_vector, k=k or self.k, filter=search_filter
+        ))
+
+    def retrieve_with_scores(self, query_vector, k: int = None, search_filter: dict = None):
+        """
+        Like `retrieve`, but returns (document, relevance) pairs, higher relevance first.
+        """
+        relevance = self.vector_store._select_relevance_score_fn()
+        hits = self.vector_store.similarity_search_by_vector_with_relevance_scores(
+            query_vector, k=k or self.k, filter=search_filter
+        )
+        # The vector store returns distances; turn them into relevance scores
+        return self._expand_hits([(document, relevance(distance)) for document, distance in hits])
+
+    def retrieve_many_with_scores(self, query_vectors, k: int = None, search_filter: dict = None):
+        """
+        Runs one vector-store query for many query vectors and returns, per vector,
+        (document, relevance) pairs, higher relevance first. Documents carry their IDs
+        and, like `retrieve`, their parent chunk text.
+        """
+        from langchain_core.documents import Document
+
+        relevance = self.vector_store._select_relevance_score_fn()
+        if hasattr(self.vector_store, "similarity_search_by_vectors_with_relevance_scores"):
+            return [
+                self._expand_hits([(document, relevance(distance)) for document, distance in hits])
+                for hits in self.vector_store.similarity_search_by_vectors_with_relevance_scores(
+                    query_vectors, k=k or self.k, filter=search_filter
+                )
+            ]
+
+        results = self.vector_store._collection.query(
+            query_embeddings=[list(map(float, vector)) for vector in query_vectors],
+            n_results=k or self.k,
+            where=search_filter,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            self._expand_hits([
+                (Document(page_content=text, metadata=metadata or {}, id=doc_id), relevance(distance))
+                for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+            ])
+            for ids, texts, metadatas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    def select_context(self, hits: list, k: int = None) -> list:
+        """
+        Turns scored hits into the documents stuffed into the prompt: packed into the
+        token budget when one is set, otherwise the top k.
+        """
+        if self.context_token_budget:
+            from context_packing import pack_context
+
+            return pack_context(hits, self.context_token_budget, parent_store=self.parent_store)
+        return [document for document, _ in hits[:k or self.k]]
+
+    def generate(self, question: str, documents: list) -> str:
+        return self.combine_docs_chain.invoke({"input": question, "context": documents})
+
+    def _prepare(self, question: str, k: int, search_filter: dict, timer: StageTimer):
+        """
+        Runs the stages before generation: embed the query, check the answer cache and,
+        on a miss, retrieve. Returns (query_vector, cache_scope, cached_answer, documents).
+        """
+        with timer.stage("embed_query"):
+            query_vector = self.embed_query(question)
+
+        scope = None
+        if self.answer_cache is not None:
+            scope = self.cache_scope(k, search_filter)
+            with timer.stage("answer_cache"):
+                cached = self.answer_cache.lookup(query_vector, scope)
+            if cached is not None:
+                return query_vector, scope, cached, cached["context"]
+
+        if not self.context_token_budget:
+            with timer.stage("retrieve"):
+                documents = self.retrieve(query_vector, k, search_filter)
+            return query_vector, scope, None, documents
+
+        with timer.stage("retrieve"):
+            hits = self.retrieve_with_scores(query_vector, self.retrieval_k(k), search_filter)
+        with timer.stage("pack_context"):
+            documents = self.select_context(hits, k)
+        return query_vector, scope, None, documents
+
+    def _remember(self, query_vector, scope, answer: str, documents: list):
+        if self.answer_cache is not None:
+            self.answer_cache.store(query_vector, {"answer": answer, "context": documents}, scope)
+
+    def answer(self, question: str, k: int = None, search_filter: dict = None, timer: StageTimer = None, generation_slot=None) -> dict:
+        """
+        Answers a question and returns the answer, the retrieved documents and the
+        milliseconds spent in each stage. `search_filter` is a Chroma `where` clause
+        (see `build_metadata_filter`) that scopes retrieval for this request only.
+
+        `generation_slot` is an optional context manager entered around the LLM call,
+        which lets a caller cap how many generations run at once.
+        """
+        timer = timer or StageTimer()
+        query_vector, scope, cached, documents = self._prepare(question, k, search_filter, timer)
+        if cached is not None:
+            return {**cached, "input": question, "cached": True, "timings_ms": dict(timer.stages)}
+
+        with generation_slot or nullcontext():
+            with timer.stage("generate"):
+                answer = self.generate(question, documents)
+
+        self._remember(query_vector, scope, answer, documents)
+        return {"input": question, "answer": answer, "context": documents, "cached": False, "timings_ms": dict(timer.stages)}
+
+    def stream(self, question: str, k: int = None, search_filter: dict = None, generation_slot=None):
+        """
+        Answers a question as a stream of events.
+
+        Yields `{"type": "context", "documents": [...]}` as soon as retrieval finishes,
+        then one `{"type": "token", "text": ...}` per generated token, and finally
+        `{"type": "done", "answer": ..., "ttft_ms": ..., "timings_ms": {...}}`, where
+        `ttft_ms` is the time from the call to the first token.
+        """
+        started = time.perf_counter()
+        timer = StageTimer()
+        query_vector, scope, cached, documents = self._prepare(question, k, search_filter, timer)
+        yield {"type": "context", "documents": documents}
+
+        if cached is not None:
+            ttft_ms = (time.perf_counter() - started) * 1000
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"], "cached": True, "ttft_ms": ttft_ms, "timings_ms": dict(timer.stages)}
+            return
+
+        tokens = []
+        ttft_ms = None
+        with generation_slot or nullcontext():
+            with timer.stage("generate"):
+                for token in self.combine_docs_chain.stream({"input": question, "context": documents}):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    tokens.append(token)
+                    yield {"type": "token", "text": token}
+
+        answer = "".join(tokens)
+        self._remember(query_vector, scope, answer, documents)
+        yield {"type": "done", "answer": answer, "cached": False, "ttft_ms": ttft_ms, "timings_ms": dict(timer.stages)}
+
+    async def astream(self, question: str, k: int = None, search_filter: dict = None):
+        """
+        Async-iterator version of `stream`, yielding the same events.
+        """
+        started = time.perf_counter()
+        timer = StageTimer()
+        query_vector, scope, cached, documents = await asyncio.to_thread(
+            self._prepare, question, k, search_filter, timer
+        )
+        yield {"type": "context", "documents": documents}
+
+        if cached is not None:
+            ttft_ms = (time.perf_counter() - started) * 1000
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"], "cached": True, "ttft_ms": ttft_ms, "timings_ms": dict(timer.stages)}
+            return
+
+        tokens = []
+        ttft_ms = None
+        generate_started = time.perf_counter()
+        async for token in self.combine_docs_chain.astream({"input": question, "context": documents}):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            tokens.append(token)
+            yield {"type": "token", "text": token}
+        timer.stages["generate"] = (time.perf_counter() - generate_started) * 1000
+
+        answer = "".join(tokens)
+        self._remember(query_vector, scope, answer, documents)
+        yield {"type": "done", "answer": answer, "cached": False, "ttft_ms": ttft_ms, "timings_ms": dict(timer.stages)}
+
 if __name__ == "__main__":
-    persist_directory = "./chroma_db"
+    parser = argparse.ArgumentParser(description="Ask a question against the persisted vector store.")
+    parser.add_argument("question", nargs="?", default="what Dataprep is used for")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--prompt-source", choices=["local", "cached", "hub"], default=RAG_PROMPT_SOURCE)
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Preload the models on the Ollama host before building the chain")
+    parser.add_argument("--timings", action="store_true", help="Print the startup time breakdown")
+    parser.add_argument("--source-file", action="append",
+                        help="Only search chunks from this source file (repeatable)")
+    parser.add_argument("--min-length", type=int, help="Only search chunks at least this long")
+    parser.add_argument("--max-length", type=int, help="Only search chunks at most this long")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print the retrieved context right away and stream the answer token by token")
+    args = parser.parse_args()
 
     try:
-        # Create the retrieval chain
-        retrieval_chain = create_retrieval_qa_chain(persist_directory)
+        timer = StageTimer()
+
+        if args.warm_up:
+            with timer.stage("warm up models"):
+                warm_up_models()
 
-        # Invoke the chain
-        response = retrieval_chain.invoke(
-            {"input": "what Dataprep is used for"},
-            filter={"source_file": "state_of_the_union.txt"} 
+        search_filter = build_metadata_filter(
+            source_file=args.source_file,
+            min_length=args.min_length,
+            max_length=args.max_length
         )
-        print(response['answer'])
-        print(response['context'])
+
+        if args.stream:
+            with timer.stage("build pipeline"):
+                pipeline = RagPipeline(args.persist_directory, prompt_source=args.prompt_source)
+            if args.timings:
+                print(f"Startup breakdown:\n{timer.report()}")
+
+            for event in pipeline.stream(args.question, search_filter=search_filter):
+                if event["type"] == "context":
+                    print(event["documents"], flush=True)
+                elif event["type"] == "token":
+                    print(event["text"], end="", flush=True)
+                elif event["ttft_ms"] is not None:
+                    print(f"\n\nTime to first token: {event['ttft_ms']:.0f} ms")
+        else:
+            # Create the retrieval chain
+            retrieval_chain = create_retrieval_qa_chain(
+                args.persist_directory, args.prompt_source, timer, search_filter=search_filter
+            )
+
+            if args.timings:
+                print(f"Startup breakdown:\n{timer.report()}")
+
+            # Invoke the chain
+            response = retrieval_chain.invoke({"input": args.question})
+            print(response['answer'])
+            print(response['context'])
 
     except Exception as e:
         print(f"An error occurred: {e}")
         if "404" in str(e):
             print("The API endpoint was not found. Check the base URL and ensure the server is running.")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,287 @@
+import argparse
+import itertools
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rag import RAG_ANSWER_CACHE, RagPipeline, build_metadata_filter, warm_up_models
+from timing import LatencyStats
+
+RAG_SERVER_WORKERS = int(os.getenv('RAG_SERVER_WORKERS', '8'))
+RAG_SERVER_MAX_PENDING = int(os.getenv('RAG_SERVER_MAX_PENDING', '32'))
+RAG_SERVER_MAX_GENERATIONS = int(os.getenv('RAG_SERVER_MAX_GENERATIONS', '2'))
+RAG_SERVER_GENERATION_WAIT = float(os.getenv('RAG_SERVER_GENERATION_WAIT', '30'))
+RAG_SERVER_REQUEST_TIMEOUT = float(os.getenv('RAG_SERVER_REQUEST_TIMEOUT', '300'))
+
+
+class Overloaded(Exception):
+    """
+    Raised when the service cannot take more work right now; maps to HTTP 503.
+    """
+
+
+def document_to_dict(document) -> dict:
+    return {"page_content": document.page_content, "metadata": document.metadata}
+
+
+class QueryService:
+    """
+    Runs RAG queries on a bounded worker pool with admission control.
+
+    At most `max_pending` requests are admitted (running or queued) and at most
+    `max_generations` of them talk to the LLM at once. Requests beyond either limit
+    are rejected with `Overloaded` instead of piling up behind a saturated model.
+    Streaming requests go through the same admission and run on the same pool.
+    """
+
+    def __init__(
+        self,
+        pipeline: RagPipeline,
+        workers: int = RAG_SERVER_WORKERS,
+        max_pending: int = RAG_SERVER_MAX_PENDING,
+        max_generations: int = RAG_SERVER_MAX_GENERATIONS,
+        generation_wait: float = RAG_SERVER_GENERATION_WAIT,
+    ):
+        self.pipeline = pipeline
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-query")
+        self.admission = threading.BoundedSemaphore(max_pending)
+        self.generations = threading.BoundedSemaphore(max_generations)
+        self.generation_wait = generation_wait
+        self.latency = LatencyStats()
+        self.rejected = 0
+        self._rejected_lock = threading.Lock()
+
+    def _admit(self):
+        if not self.admission.acquire(blocking=False):
+            with self._rejected_lock:
+                self.rejected += 1
+            raise Overloaded("Too many pending requests, retry later.")
+
+    @contextmanager
+    def generation_slot(self):
+        if not self.generations.acquire(timeout=self.generation_wait):
+            raise Overloaded("The language model is saturated, retry later.")
+        try:
+            yield
+        finally:
+            self.generations.release()
+
+    def _run(self, request: dict) -> dict:
+        try:
+            result = self.pipeline.answer(
+                request["question"],
+                k=request.get("k"),
+                search_filter=request.get("search_filter"),
+                generation_slot=self.generation_slot(),
+            )
+            self.latency.record(result["timings_ms"])
+            return result
+        finally:
+            self.admission.release()
+
+    def submit(self, request: dict):
+        """
+        Admits a request and schedules it on the worker pool, or raises `Overloaded`.
+        """
+        self._admit()
+        try:
+            return self.executor.submit(self._run, request)
+        except Exception:
+            self.admission.release()
+            raise
+
+    def _run_stream(self, request: dict, events: queue.Queue, cancelled: threading.Event):
+        try:
+            stream = self.pipeline.stream(
+                request["question"],
+                k=request.get("k"),
+                search_filter=request.get("search_filter"),
+                generation_slot=self.generation_slot(),
+            )
+            try:
+                for event in stream:
+                    if cancelled.is_set():
+                        break
+                    if event["type"] == "done":
+                        stages = dict(event["timings_ms"])
+                        if event["ttft_ms"] is not None:
+                            stages["ttft"] = event["ttft_ms"]
+                        self.latency.record(stages)
+                    events.put(event)
+            finally:
+                stream.close()
+            events.put(None)
+        except Exception as e:
+            events.put(e)
+        finally:
+            self.admission.release()
+
+    def stream(self, request: dict):
+        """
+        Admits a request, runs it on the worker pool and yields its streaming events.
+        `Overloaded` is raised by the first `next()` when the request is rejected.
+        """
+        self._admit()
+        events = queue.Queue()
+        cancelled = threading.Event()
+        try:
+            self.executor.submit(self._run_stream, request, events, cancelled)
+        except Exception:
+            self.admission.release()
+            raise
+
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            # Stops the worker early when the client goes away
+            cancelled.set()
+
+    def metrics(self) -> dict:
+        with self._rejected_lock:
+            rejected = self.rejected
+        metrics = {"stages": self.latency.summary(), "rejected": rejected}
+        if self.pipeline.answer_cache is not None:
+            metrics["answer_cache"] = self.pipeline.answer_cache.stats()
+        return metrics
+
+
+class RagRequestHandler(BaseHTTPRequestHandler):
+    service: QueryService = None
+    request_timeout: float = RAG_SERVER_REQUEST_TIMEOUT
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _read_request(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("The request body must be a JSON object")
+        if not isinstance(request.get("question"), str) or not request["question"].strip():
+            raise ValueError("'question' must be a non-empty string")
+        k = request.get("k")
+        if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 1):
+            raise ValueError("'k' must be a positive integer")
+        if not isinstance(request.get("filter", {}), dict):
+            raise ValueError("'filter' must be an object")
+        request["search_filter"] = build_metadata_filter(**request.get("filter", {}))
+        return request
+
+    def _stream_events(self, request: dict):
+        """
+        Writes the pipeline's streaming events as newline-delimited JSON.
+        """
+        events = self.service.stream(request)
+        try:
+            first_event = next(events)
+        except Overloaded as e:
+            self._send_json(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"An error occurred: {e}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for event in itertools.chain([first_event], events):
+                if event["type"] == "context":
+                    event = {**event, "documents": [document_to_dict(document) for document in event["documents"]]}
+                self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except Exception as e:
+            self.wfile.write(json.dumps({"type": "error", "error": str(e)}).encode("utf-8") + b"\n")
+        finally:
+            events.close()
+            self.close_connection = True
+
+    def do_POST(self):
+        if self.path not in ("/query", "/stream"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            request = self._read_request()
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if self.path == "/stream":
+            self._stream_events(request)
+            return
+
+        try:
+            result = self.service.submit(request).result(timeout=self.request_timeout)
+        except Overloaded as e:
+            self._send_json(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        except FutureTimeoutError:
+            self._send_json(504, {"error": "The query timed out."})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"An error occurred: {e}"})
+            return
+
+        self._send_json(200, {
+            "answer": result["answer"],
+            "context": [document_to_dict(document) for document in result["context"]],
+            "cached": result["cached"],
+            "timings_ms": result["timings_ms"],
+        })
+
+
+def serve(persist_directory: str, host: str, port: int, warm_up: bool = False, answer_cache: bool = RAG_ANSWER_CACHE):
+    """
+    Builds the retrieval pipeline once and serves queries until interrupted.
+    """
+    if warm_up:
+        warm_up_models()
+
+    RagRequestHandler.service = QueryService(RagPipeline(persist_directory, answer_cache=answer_cache))
+    server = ThreadingHTTPServer((host, port), RagRequestHandler)
+    print(f"RAG query server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        RagRequestHandler.service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve RAG queries over HTTP.")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--warm-up", action="store_true", help="Preload the models at boot")
+    parser.add_argument("--answer-cache", action="store_true", default=RAG_ANSWER_CACHE,
+                        help="Answer near-duplicate questions from the semantic answer cache")
+    args = parser.parse_args()
+
+    serve(args.persist_directory, args.host, args.port, warm_up=args.warm_up, answer_cache=args.answer_cache)
@@ -0,0 +1,113 @@
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Default threshold amount per breakpoint mode, matching SemanticChunker
+BREAKPOINT_DEFAULTS = {
+    "percentile": 95,
+    "standard_deviation": 3,
+    "interquartile": 1.5,
+    "gradient": 95,
+}
+
+
+class VectorizedSemanticChunker:
+    """
+    Semantic chunker with the same breakpoint modes as langchain's `SemanticChunker`.
+
+    Sentences are embedded once (with `buffer_size` neighbours on each side, as
+    SemanticChunker does) and all distance and threshold math runs as NumPy over the
+    sentence-embedding matrix. `split_text_with_embeddings` also returns one vector per
+    chunk, mean-pooled from its sentence vectors, so the chunks can be written to the
+    vector store without a second embedding pass.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        buffer_size: int = 1,
+        breakpoint_threshold_type: str = "percentile",
+        breakpoint_threshold_amount: Optional[float] = None,
+        sentence_split_regex: str = r"(?<=[.?!])\s+",
+    ):
+        if breakpoint_threshold_type not in BREAKPOINT_DEFAULTS:
+            raise ValueError(f"Unknown breakpoint_threshold_type: {breakpoint_threshold_type}")
+
+        self.embeddings = embeddings
+        self.buffer_size = buffer_size
+        self.breakpoint_threshold_type = breakpoint_threshold_type
+        self.breakpoint_threshold_amount = (
+            BREAKPOINT_DEFAULTS[breakpoint_threshold_type]
+            if breakpoint_threshold_amount is None
+            else breakpoint_threshold_amount
+        )
+        self.sentence_split_regex = sentence_split_regex
+
+    def _combine_sentences(self, sentences: List[str]) -> List[str]:
+        combined = []
+        for i in range(len(sentences)):
+            start = max(0, i - self.buffer_size)
+            combined.append(" ".join(sentences[start:i + self.buffer_size + 1]))
+        return combined
+
+    def _breakpoints(self, distances: np.ndarray) -> np.ndarray:
+        amount = self.breakpoint_threshold_amount
+        if self.breakpoint_threshold_type == "percentile":
+            values = distances
+            threshold = np.percentile(values, amount)
+        elif self.breakpoint_threshold_type == "standard_deviation":
+            values = distances
+            threshold = np.mean(values) + amount * np.std(values)
+        elif self.breakpoint_threshold_type == "interquartile":
+            values = distances
+            q1, q3 = np.percentile(values, [25, 75])
+            threshold = np.mean(values) + amount * (q3 - q1)
+        else:
+            values = np.gradient(distances) if len(distances) > 1 else distances
+            threshold = np.percentile(values, amount)
+        return np.flatnonzero(values > threshold)
+
+    def split_text_with_embeddings(self, text: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Splits text into semantic chunks and returns them with one normalized vector per chunk.
+        """
+        sentences = re.split(self.sentence_split_regex, text)
+        vectors = np.asarray(
+            self.embeddings.embed_documents(self._combine_sentences(sentences)), dtype=np.float32
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        too_short = len(sentences) == 1 or (
+            self.breakpoint_threshold_type == "gradient" and len(sentences) == 2
+        )
+        if too_short:
+            boundaries = np.arange(len(sentences))
+        else:
+            # Cosine distance between each sentence and the next one
+            distances = 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+            boundaries = self._breakpoints(distances)
+
+        starts = np.concatenate(([0], boundaries + 1))
+        ends = np.concatenate((boundaries + 1, [len(sentences)]))
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+
+        chunks = [" ".join(sentences[start:end]) for start, end in zip(starts, ends)]
+
+        # Mean-pool each chunk's sentence vectors with one reduceat over the matrix
+        sums = np.add.reduceat(vectors, starts, axis=0)
+        pooled = sums / (ends - starts)[:, None]
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled /= np.where(norms == 0, 1, norms)
+
+        return chunks, pooled
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Splits text into semantic chunks, like `SemanticChunker.split_text`.
+        """
+        chunks, _ = self.split_text_with_embeddings(text)
+        return chunks
@@ -0,0 +1,132 @@
+import glob
+import os
+import re
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+# Same sentence boundary SemanticChunker uses
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.?!])\s+")
+
+
+def iter_files(patterns: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the files matched by glob patterns or directories, in a stable order.
+    """
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.txt")
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if os.path.isfile(path):
+                yield path
+
+
+def read_blocks(file_path: str, block_chars: int = 1 << 20) -> Iterator[str]:
+    """
+    Yields a text file in fixed-size blocks instead of reading it whole.
+    """
+    with open(file_path, "r") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            yield block
+
+
+def iter_sentences(blocks: Iterable[str], max_sentence_chars: int = 20_000) -> Iterator[str]:
+    """
+    Splits a stream of text blocks into sentences, carrying partial sentences across
+    block boundaries. Text without any boundary is cut at `max_sentence_chars` so a
+    single pathological line cannot grow the carry-over without limit.
+    """
+    carry = ""
+    for block in blocks:
+        parts = SENTENCE_BOUNDARY.split(carry + block)
+        carry = parts.pop()
+        for sentence in parts:
+            if sentence.strip():
+                yield sentence
+        while len(carry) > max_sentence_chars:
+            yield carry[:max_sentence_chars]
+            carry = carry[max_sentence_chars:]
+    if carry.strip():
+        yield carry
+
+
+def iter_chunks(sentences: Iterable[str], text_splitter, window_sentences: int = 256, with_embeddings: bool = False) -> Iterator:
+    """
+    Runs the semantic chunker over sliding windows of sentences.
+
+    The last chunk of each window may continue in the next window, so it is carried
+    over and re-chunked together with the following sentences, unless it already spans
+    a whole window of sentences; then it is emitted, so text without semantic breaks
+    cannot grow the carry without limit. With `with_embeddings` the splitter's pooled
+    chunk vectors are kept and `(chunk, vector)` pairs are yielded.
+    """
+    def split(window):
+        if with_embeddings:
+            chunks, vectors = text_splitter.split_text_with_embeddings(" ".join(window))
+            return list(zip(chunks, vectors))
+        return text_splitter.split_text(" ".join(window))
+
+    window = []
+    for sentence in sentences:
+        window.append(sentence)
+        if len(window) >= window_sentences:
+            chunks = split(window)
+            yield from chunks[:-1]
+            last = chunks[-1]
+            last_text = last[0] if with_embeddings else last
+            if len(SENTENCE_BOUNDARY.split(last_text)) >= window_sentences:
+                yield last
+                window = []
+            else:
+                window = [last_text]
+    if window:
+        yield from split(window)
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Groups an iterable into lists of at most `batch_size` items.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class ProgressReporter:
+    """
+    Prints files, chunks and throughput at most every `interval` seconds.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.files = 0
+        self.chunks = 0
+        self.bytes = 0
+
+    def file_done(self, file_path: str):
+        self.files += 1
+        self.bytes += os.path.getsize(file_path)
+        self.maybe_report()
+
+    def chunks_done(self, count: int):
+        self.chunks += count
+        self.maybe_report()
+
+    def maybe_report(self):
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            print(self.summary())
+
+    def summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"{self.files} files, {self.chunks} chunks, {self.bytes / 1e6:.1f} MB "
+            f"in {elapsed:.1f}s ({self.chunks / elapsed:.1f} chunks/s, "
+            f"{self.bytes / 1e6 / elapsed:.2f} MB/s)"
+        )
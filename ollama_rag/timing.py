@@ -0,0 +1,75 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Records wall-clock milliseconds per named stage.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def report(self) -> str:
+        lines = [f"  {name:<24} {ms:9.1f} ms" for name, ms in self.stages.items()]
+        lines.append(f"  {'total':<24} {self.total():9.1f} ms")
+        return "\n".join(lines)
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Returns the nearest-rank percentile of a list of numbers (0.0 when empty).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyStats:
+    """
+    Thread-safe rolling window of per-stage latencies in milliseconds.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, stages: dict):
+        with self._lock:
+            for name, ms in stages.items():
+                self._samples.setdefault(name, deque(maxlen=self.window)).append(ms)
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "count": counts[name],
+                "mean_ms": sum(samples) / len(samples),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+            }
+            for name, samples in snapshot.items()
+        }
@@ -1,12 +1,18 @@
 import os
+import hashlib
+import json
 from swarm import Swarm, Agent
 from dotenv import load_dotenv
-import subprocess
-from pydub import AudioSegment
 import re
-import tempfile
+import time
+import queue
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from tts_backends import SynthesisPool, create_backend
+from tts_cache import TTSCache
+from wav_assembly import WavAssembler
 
 # Load environment variables
 load_dotenv()
@@ -14,9 +20,27 @@ load_dotenv()
 # Get necessary environment variables
 OPENAI_MODEL_NAME = os.getenv('OPENAI_MODEL_NAME_LARGE')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+NARRATIVE_MAX_WORKERS = int(os.getenv('NARRATIVE_MAX_WORKERS', '4'))
+# LLM calls in flight at once, across files, sections and extraction
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', '2'))
+OUTPUT_SAMPLE_RATE = int(os.getenv('TTS_SAMPLE_RATE', '22050'))
+TTS_JOBS = int(os.getenv('TTS_JOBS', '2'))
+# Pause inserted after every synthesized sentence, which is its own utterance
+SENTENCE_PAUSE_MS = int(os.getenv('SENTENCE_PAUSE_MS', '200'))
+# Sentence-level audio cache; an empty path disables it
+TTS_CACHE_PATH = os.getenv('TTS_CACHE_PATH', './podcast/tts_cache.sqlite3')
+TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', '1024'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '4'))
+# Inputs longer than this are narrated section by section; 0 always sends the whole file
+NARRATIVE_SECTION_CHARS = int(os.getenv('NARRATIVE_SECTION_CHARS', '12000'))
+NARRATIVE_SECTION_WORKERS = int(os.getenv('NARRATIVE_SECTION_WORKERS', '4'))
+# Per-section entity and topic lists merged per call when building the document's lists
+NARRATIVE_REDUCE_GROUP = int(os.getenv('NARRATIVE_REDUCE_GROUP', '8'))
 
 # Initialize Swarm client
 client = Swarm()
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
 
 # Initialize Agents
 narrative_agent = Agent(
@@ -36,67 +60,314 @@ lda_agent = Agent(
 )
 
 ent_agent = Agent(
-    name="lda",
+    name="entities",
     instructions=(
         "extract a list of all entities present in the text"
     ),
     model=OPENAI_MODEL_NAME
 )
 
+SECTION_INSTRUCTIONS = (
+    "You are narrating section {index} of {count} of a longer document, and the sections are "
+    "played back to back. Continue the monologue without greeting the listener, introducing the "
+    "show or signing off. Keep names and terms consistent with the whole document, whose "
+    "entities are:\n{entities}\nand whose main topics are:\n{topics}"
+)
+
+def section_instructions(context_variables):
+    return narrative_agent.instructions + "\n\n" + SECTION_INSTRUCTIONS.format(**context_variables)
+
+section_agent = Agent(
+    name="Podcast Section Stylist",
+    instructions=section_instructions,
+    model=OPENAI_MODEL_NAME
+)
+
+consolidate_agent = Agent(
+    name="consolidate",
+    instructions=(
+        "You are given lists extracted from consecutive parts of one document. Merge them into "
+        "a single list without duplicates, using one consistent name for each item. Respond "
+        "with the merged list only."
+    ),
+    model=OPENAI_MODEL_NAME
+)
+
+merge_agent = Agent(
+    name="Podcast Editor",
+    instructions=(
+        "You are given the entities and main topics of a document whose podcast monologue has "
+        "already been written section by section, followed by the first and last paragraph of "
+        "every section. Write a short spoken opening that introduces the episode and its "
+        "topics, then the line '---', then a short spoken closing that recaps them. Then add "
+        "the line '---' and, one per line as 'variant => preferred', every name or term the "
+        "sections spell or call differently, so they can be made consistent. Avoid non-verbal "
+        "cues or stage directions."
+    ),
+    model=OPENAI_MODEL_NAME
+)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def sha256_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def narrative_meta(content):
+    """
+    Describes what a narrative was generated from: the source text, the model and the prompt.
+    """
+    return {
+        "source_sha256": sha256_text(content),
+        "model": narrative_agent.model,
+        "prompt_sha256": sha256_text(
+            narrative_agent.instructions + SECTION_INSTRUCTIONS + merge_agent.instructions
+            + lda_agent.instructions + ent_agent.instructions + consolidate_agent.instructions
+        ),
+        "section_chars": NARRATIVE_SECTION_CHARS,
+    }
+
+def is_up_to_date(output_file, meta):
+    """
+    True when the output exists and its sidecar .meta.json matches `meta`.
+    """
+    meta_file = output_file + '.meta.json'
+    if not (os.path.exists(output_file) and os.path.exists(meta_file)):
+        return False
+    try:
+        with open(meta_file, 'r') as f:
+            return json.load(f) == meta
+    except ValueError:
+        return False
+
+def write_narrative(output_file, narrative, meta):
+    """
+    Writes the narrative, then its sidecar, each atomically, so an interrupted run is redone.
+    """
+    for path, data in ((output_file, narrative), (output_file + '.meta.json', json.dumps(meta, indent=2))):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as output:
+            output.write(data)
+        os.replace(tmp_path, path)
+
+HEADING = re.compile(r'^(#{1,6}\s|chapter\b|section\b|part\b|\d+(\.\d+)*\.?\s+[A-Z])', re.IGNORECASE)
+
+def split_sections(text, max_chars):
+    """
+    Splits text into sections of at most about `max_chars`, at structural boundaries.
+
+    Sections break at headings once they are at least half full, otherwise at paragraph
+    breaks; a paragraph longer than `max_chars` is split between sentences.
+    """
+    paragraphs = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        if not paragraph.strip():
+            continue
+        while len(paragraph) > max_chars:
+            cut = max(paragraph.rfind('. ', 0, max_chars), paragraph.rfind('\n', 0, max_chars))
+            cut = cut + 1 if cut > 0 else max_chars
+            paragraphs.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        paragraphs.append(paragraph)
+
+    sections, current, size = [], [], 0
+    for paragraph in paragraphs:
+        heading = bool(HEADING.match(paragraph.lstrip()))
+        if current and (size + len(paragraph) > max_chars or (heading and size >= max_chars // 2)):
+            sections.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+    if current:
+        sections.append('\n\n'.join(current))
+    return sections
+
+def run_agent(agent, content, context_variables=None):
+    """
+    Runs one agent call, waiting for one of the LLM_CONCURRENCY slots shared by all callers.
+    """
+    with _llm_slots:
+        response = client.run(
+            agent=agent,
+            messages=[{"role": "user", "content": content}],
+            context_variables=context_variables or {},
+        )
+    return response.messages[-1]["content"]
+
+def consolidate(lists, executor, group_size=NARRATIVE_REDUCE_GROUP):
+    """
+    Reduces per-section lists to one, merging `group_size` lists per call until one is left.
+    """
+    group_size = max(2, group_size)
+    while len(lists) > 1:
+        groups = [lists[i:i + group_size] for i in range(0, len(lists), group_size)]
+        lists = list(executor.map(
+            lambda group: group[0] if len(group) == 1 else run_agent(consolidate_agent, '\n\n'.join(group)),
+            groups,
+        ))
+    return lists[0]
+
+def extract_document_context(sections, max_workers=NARRATIVE_SECTION_WORKERS):
+    """
+    Map-reduce entity and topic extraction: both run on every whole section, then
+    the per-section lists are merged into one list each for the document.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        entities = list(executor.map(lambda section: run_agent(ent_agent, section), sections))
+        topics = list(executor.map(lambda section: run_agent(lda_agent, section), sections))
+        return {"entities": consolidate(entities, executor), "topics": consolidate(topics, executor)}
+
+def section_outline(narratives):
+    """
+    The first and last paragraph of every narrated section, for the merge pass.
+    """
+    outline = []
+    for index, narrative in enumerate(narratives, start=1):
+        paragraphs = [paragraph.strip() for paragraph in re.split(r'\n\s*\n', narrative) if paragraph.strip()]
+        if not paragraphs:
+            continue
+        ends = paragraphs[:1] + paragraphs[-1:] if len(paragraphs) > 1 else paragraphs
+        outline.append(f"Section {index}:\n" + '\n...\n'.join(ends))
+    return '\n\n'.join(outline)
+
+def apply_renames(text, renames):
+    """
+    Replaces each 'variant => preferred' pair from the merge pass, on whole words.
+    """
+    for line in renames.splitlines():
+        variant, arrow, preferred = line.partition('=>')
+        variant, preferred = variant.strip(' -*\t'), preferred.strip()
+        if arrow and variant and preferred and variant != preferred:
+            text = re.sub(rf'\b{re.escape(variant)}\b', preferred, text)
+    return text
+
+def generate_sectioned_narrative(content, max_chars=NARRATIVE_SECTION_CHARS, max_workers=NARRATIVE_SECTION_WORKERS):
+    """
+    Map-reduce narration for long inputs: extract entities and topics per section and
+    merge them, narrate the sections in parallel with that shared context, then one
+    merge call over the sections' first and last paragraphs adds an opening and a
+    closing and lists the names to make consistent across sections.
+    """
+    sections = split_sections(content, max_chars)
+    context_variables = extract_document_context(sections, max_workers)
+    logging.info(f"Narrating {len(sections)} sections")
+
+    def narrate(numbered):
+        index, section = numbered
+        return run_agent(section_agent, section, dict(context_variables, index=index, count=len(sections)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        narratives = list(executor.map(narrate, enumerate(sections, start=1)))
+
+    reply = run_agent(
+        merge_agent,
+        f"Entities:\n{context_variables['entities']}\n\nTopics:\n{context_variables['topics']}"
+        f"\n\n{section_outline(narratives)}",
+    )
+    parts = reply.split('---')
+    if len(parts) < 2:
+        # Without the separator the bookends cannot be placed; keep the sections alone
+        logging.warning("Merge reply has no '---' separator, skipping opening and closing")
+        return '\n\n'.join(narrative.strip() for narrative in narratives if narrative.strip())
+
+    opening, closing = parts[0], parts[1]
+    narratives = [apply_renames(narrative, '\n'.join(parts[2:])) for narrative in narratives]
+    return '\n\n'.join(part.strip() for part in [opening, *narratives, closing] if part.strip())
+
+def generate_narrative(content):
+    """
+    Narrates a document in one call, or section by section when it is longer than
+    NARRATIVE_SECTION_CHARS.
+    """
+    if NARRATIVE_SECTION_CHARS and len(content) > NARRATIVE_SECTION_CHARS:
+        return generate_sectioned_narrative(content)
+
+    # Generate narrative response
+    return run_agent(narrative_agent, content)
+
+def process_file(file_path, output_folder, force=False):
+    """
+    Generates the narrative for one file unless its output is up to date.
+    Returns the output path, or None on error.
+    """
+    output_file = os.path.join(output_folder, os.path.basename(file_path))
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+
+        meta = narrative_meta(content)
+        if not force and is_up_to_date(output_file, meta):
+            logging.info(f"Skipping up-to-date narrative {output_file}")
+            return output_file
+
+        narrative = generate_narrative(content)
+
+        # Save the final content to a text file
+        write_narrative(output_file, narrative, meta)
+        logging.info(f"Saved podzcast-style response to {output_file}")
+        return output_file
+
+    except Exception as e:
+        logging.error(f"Error processing file {file_path}: {e}")
+        return None
+
+def list_text_files(base_path):
+    """
+    Returns the .txt files under base_path in a stable (sorted) order.
+    """
+    return sorted(
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(base_path)
+        for filename in filenames
+        if filename.endswith('.txt')
+    )
+
 # Function to process files in a folder
-def process_folder(base_path, output_folder):
+def process_folder(base_path, output_folder, max_workers=NARRATIVE_MAX_WORKERS, force=False):
+    """
+    Generates narratives for every .txt file with up to `max_workers` LLM calls at once.
+
+    Files whose source, model and prompt match the sidecar recorded next to their
+    output are skipped; pass force=True to regenerate everything. Returns the output
+    paths in input order (None for files that failed).
+    """
     os.makedirs(output_folder, exist_ok=True)
-    for root, _, filenames in os.walk(base_path):
-        for filename in filenames:
-            if filename.endswith('.txt'):
-                file_path = os.path.join(root, filename)
-                try:
-                    with open(file_path, 'r') as file:
-                        content = file.read()
-
-                    # ent_response = client.run(
-                    #     agent=ent_agent,
-                    #     messages=[{"role": "user", "content": content}],
-                    # )
-                    # lda_response = client.run(
-                    #     agent=narrative_agent,
-                    #     messages=[{"role": "user", "content": content}],
-                    # )
-                    # context_variables = {"entities": ent_response, "topics": lda_response}
-                    # print(context_variables)
-
-                    # Generate narrative response
-                    narrative_response = client.run(
-                        agent=narrative_agent,
-                        messages=[{"role": "user", "content": content}],
-                        # context_variables=context_variables,
-                    )
-                    narrative = narrative_response.messages[-1]["content"]
-
-                    # Save the final content to a text file
-                    output_file = os.path.join(output_folder, filename)
-                    with open(output_file, 'w') as output:
-                        output.write(narrative)
-                    logging.info(f"Saved podzcast-style response to {output_file}")
-
-                except Exception as e:
-                    logging.error(f"Error processing file {file_path}: {e}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda file_path: process_file(file_path, output_folder, force),
+            list_text_files(base_path),
+        ))
 
-# TTS Function to process text with voice cues
-def process_tts_with_voices(text, output_file):
+_tts_pool_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _create_tts_pool():
+    cache = TTSCache(TTS_CACHE_PATH, TTS_CACHE_MAX_MB * 1024 * 1024) if TTS_CACHE_PATH else None
+    return SynthesisPool(create_backend(), workers=TTS_WORKERS, cache=cache)
+
+def get_tts_pool():
     """
-    Converts text with voice change cues into audio using macOS TTS engine.
+    The process-wide synthesis pool, created on first use (backend from TTS_BACKEND),
+    backed by the sentence cache at TTS_CACHE_PATH.
     """
-    output_dir = os.path.dirname(output_file)
-    os.makedirs(output_dir, exist_ok=True)
+    # TTS jobs ask for the pool concurrently; lru_cache alone could build it twice
+    with _tts_pool_lock:
+        return _create_tts_pool()
 
-    voice_segments = re.split(r'(\[Voice: [^\]]+\])', text)
-    combined_audio = AudioSegment.empty()
+def split_sentences(segment):
+    """
+    Splits a voice segment into sentences, the unit the TTS cache works at.
+    """
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', segment) if sentence.strip()]
 
-    for segment in voice_segments:
+def split_voice_segments(text):
+    """
+    Splits text on `[Voice: ...]` cues into (voice, text) pairs, skipping empty segments.
+    Text before the first cue uses the default voice (None).
+    """
+    segments = []
+    current_voice = None
+    for segment in re.split(r'(\[Voice: [^\]]+\])', text):
         # Check for voice cue
         voice_match = re.match(r'\[Voice: ([^\]]+)\]', segment)
         if voice_match:
@@ -106,31 +377,103 @@ def process_tts_with_voices(text, output_file):
         # Skip empty segments
         if not segment.strip():
             continue
+        segments.append((current_voice, segment))
+    return segments
 
-        # Create temporary text file for TTS processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as temp_text_file:
-            temp_text_file.write(segment.encode('utf-8'))
-            temp_text_file_path = temp_text_file.name
+# TTS Function to process text with voice cues
+def process_tts_with_voices(text, output_file, pool=None):
+    """
+    Converts text with voice change cues into audio with the configured TTS backend.
 
-        # Create temporary audio file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio_file:
-            temp_audio_file_path = temp_audio_file.name
+    Segments are synthesized sentence by sentence in memory by the shared worker
+    pool, without temp files, and written to the output WAV in order as each one
+    becomes ready. Sentences already in the TTS cache are spliced in without
+    synthesis, so re-rendering an edited narrative only synthesizes what changed.
+    Each sentence is followed by SENTENCE_PAUSE_MS of silence, which is not cached.
+    """
+    pool = pool or get_tts_pool()
+    output_dir = os.path.dirname(output_file)
+    os.makedirs(output_dir, exist_ok=True)
 
-        subprocess.run(
-            ['say', '-f', temp_text_file_path, '-o', temp_audio_file_path, '--data-format=LEF32@22050']
-        )
+    sentences = [
+        (voice, sentence)
+        for voice, segment in split_voice_segments(text)
+        for sentence in split_sentences(segment)
+    ]
+    with WavAssembler(output_file, sample_rate=OUTPUT_SAMPLE_RATE) as assembler:
+        for buffer in pool.imap(sentences):
+            # Append the generated audio segment and the pause the engine would have left
+            assembler.write(buffer)
+            assembler.write_silence(SENTENCE_PAUSE_MS / 1000)
+    if pool.cache is not None:
+        pool.cache.flush()
+    logging.info(f"Generated audio saved to {output_file}")
+
+def run_pipeline(input_folder, output_text_folder, output_audio_folder, final_audio_output,
+                 narrative_workers=NARRATIVE_MAX_WORKERS, tts_jobs=TTS_JOBS, queue_size=PIPELINE_QUEUE_SIZE, force=False):
+    """
+    Generates narratives and synthesizes them as an overlapped two-stage pipeline.
 
-        # Append the generated audio segment
-        segment_audio = AudioSegment.from_wav(temp_audio_file_path)
-        combined_audio += segment_audio
+    Up to `narrative_workers` files are generated at once; each finished narrative is
+    handed through a queue of at most `queue_size` entries to `tts_jobs` synthesis
+    workers, so audio for one file is rendered while later files are still being
+    generated and a slow TTS stage holds generation back instead of piling up work.
+    Episodes are combined in sorted input order, whatever order they finish in.
+    """
+    started = time.perf_counter()
+    os.makedirs(output_text_folder, exist_ok=True)
+    files = list_text_files(input_folder)
+    ready = queue.Queue(maxsize=queue_size)
+    audio_paths = [None] * len(files)
 
-        # Clean up temporary files
-        os.remove(temp_text_file_path)
-        os.remove(temp_audio_file_path)
+    def generate(index, file_path):
+        ready.put((index, process_file(file_path, output_text_folder, force)))
 
-    # Export the combined audio to the final output file
-    combined_audio.export(output_file, format="wav")
-    logging.info(f"Generated audio saved to {output_file}")
+    def synthesize():
+        while True:
+            item = ready.get()
+            if item is None:
+                return
+            index, text_path = item
+            if text_path is None:
+                continue  # Generation failed and was already logged
+            audio_path = os.path.join(output_audio_folder, os.path.splitext(os.path.basename(text_path))[0] + '.wav')
+            try:
+                with open(text_path, 'r') as file:
+                    process_tts_with_voices(file.read(), audio_path)
+                audio_paths[index] = audio_path
+            except Exception as e:
+                logging.error(f"Error synthesizing {text_path}: {e}")
+
+    consumers = [threading.Thread(target=synthesize, name=f'tts-job-{i}') for i in range(tts_jobs)]
+    for consumer in consumers:
+        consumer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=narrative_workers) as executor:
+            list(executor.map(generate, range(len(files)), files))
+    finally:
+        for _ in consumers:
+            ready.put(None)
+        for consumer in consumers:
+            consumer.join()
+
+    # Stream every episode into the combined podcast audio, in input order
+    with WavAssembler(final_audio_output, sample_rate=OUTPUT_SAMPLE_RATE) as combined_audio:
+        for audio_path in audio_paths:
+            if audio_path is not None:
+                combined_audio.append_wav(audio_path)
+    logging.info(
+        f"Final podcast audio saved to {final_audio_output} "
+        f"({sum(path is not None for path in audio_paths)}/{len(files)} episodes, "
+        f"{time.perf_counter() - started:.1f}s)"
+    )
+    cache = get_tts_pool().cache
+    if cache is not None:
+        stats = cache.stats()
+        logging.info(
+            f"TTS cache: {stats['hits']} sentences reused, {stats['misses']} synthesized, "
+            f"{stats['entries']} cached ({stats['bytes'] / (1024 * 1024):.1f} MB)"
+        )
 
 # Main processing
 if __name__ == "__main__":
@@ -139,31 +482,5 @@ if __name__ == "__main__":
     output_audio_folder = "./podcast/audio_files"  # Folder for audio files
     final_audio_output = "./podcast/final_podcast.wav"  # Combined audio file
 
-    # Process text files into podcast narratives
-    process_folder(input_folder, output_text_folder)
-
-    # Generate audio for each text response
-    combined_audio = AudioSegment.empty()
-    with ThreadPoolExecutor() as executor:
-        futures = []
-        for text_file in os.listdir(output_text_folder):
-            if text_file.endswith('.txt'):
-                text_path = os.path.join(output_text_folder, text_file)
-                output_audio_path = os.path.join(output_audio_folder, text_file.replace('.txt', '.wav'))
-
-                with open(text_path, 'r') as file:
-                    text_content = file.read()
-                    futures.append(executor.submit(process_tts_with_voices, text_content, output_audio_path))
-
-        for future in futures:
-            future.result()  # Wait for all threads to complete
-
-    # Append to combined audio
-    for audio_file in os.listdir(output_audio_folder):
-        if audio_file.endswith('.wav'):
-            audio_path = os.path.join(output_audio_folder, audio_file)
-            combined_audio += AudioSegment.from_wav(audio_path)
-
-    # Export the combined podcast audio
-    combined_audio.export(final_audio_output, format="wav")
-    logging.info(f"Final podcast audio saved to {final_audio_output}")
+    # Generate narratives and their audio as an overlapped pipeline
+    run_pipeline(input_folder, output_text_folder, output_audio_folder, final_audio_output)
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import math
+import wave
+import array
+import tempfile
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AudioBuffer:
+    """
+    In-memory PCM audio: interleaved little-endian samples plus their format.
+    """
+
+    def __init__(self, frames, sample_rate, sample_width=2, channels=1):
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+
+    @property
+    def duration(self):
+        return len(self.frames) / (self.sample_rate * self.sample_width * self.channels)
+
+
+class TTSBackend:
+    """
+    Interface for speech engines: turn a piece of text into PCM audio in memory.
+
+    `voice` is the name from a `[Voice: ...]` cue, or None for the backend's default.
+    Backends must be safe to call from several threads at once.
+    """
+
+    name = "base"
+
+    def synthesize(self, text, voice=None):
+        raise NotImplementedError
+
+    def cache_identity(self, voice=None):
+        """
+        Everything besides the text that determines the audio: backend, voice and format.
+        """
+        return [self.name, voice]
+
+    def close(self):
+        pass
+
+
+class SayBackend(TTSBackend):
+    """
+    macOS `say`. The engine only writes files, so each segment still spawns a process,
+    but the text goes through stdin and the audio is read straight back into memory.
+    """
+
+    name = "say"
+
+    def __init__(self, sample_rate=22050):
+        self.sample_rate = sample_rate
+
+    def cache_identity(self, voice=None):
+        return [self.name, voice, 'LEI16', self.sample_rate]
+
+    def synthesize(self, text, voice=None):
+        with tempfile.NamedTemporaryFile(suffix='.wav') as audio_file:
+            command = ['say', '-f', '-', '-o', audio_file.name, '--file-format=WAVE',
+                       f'--data-format=LEI16@{self.sample_rate}']
+            if voice:
+                command += ['-v', voice]
+            subprocess.run(command, input=text.encode('utf-8'), check=True)
+            with wave.open(audio_file.name, 'rb') as reader:
+                return AudioBuffer(
+                    reader.readframes(reader.getnframes()),
+                    reader.getframerate(), reader.getsampwidth(), reader.getnchannels(),
+                )
+
+
+class PiperBackend(TTSBackend):
+    """
+    Piper neural TTS running in-process on ONNX Runtime, so it works on Linux without
+    spawning anything per segment.
+
+    `voices` maps cue voice names to .onnx model paths; unknown or missing voices use
+    `default_model`. Each model is loaded once and shared by all workers.
+    """
+
+    name = "piper"
+
+    def __init__(self, default_model, voices=None):
+        from piper import PiperVoice
+
+        self._load = PiperVoice.load
+        self.default_model = default_model
+        self.voices = voices or {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, voice):
+        path = self.voices.get(voice, self.default_model)
+        with self._lock:
+            if path not in self._models:
+                self._models[path] = self._load(path)
+            return self._models[path]
+
+    def cache_identity(self, voice=None):
+        # The voice model fixes the sample format (16-bit mono at its own rate)
+        return [self.name, self.voices.get(voice, self.default_model)]
+
+    def synthesize(self, text, voice=None):
+        model = self._model(voice)
+        sample_rate = model.config.sample_rate
+        if hasattr(model, 'synthesize_stream_raw'):
+            # piper-tts < 1.3 yields raw 16-bit mono PCM per sentence
+            frames = b''.join(model.synthesize_stream_raw(text))
+        else:
+            frames = b''.join(chunk.audio_int16_bytes for chunk in model.synthesize(text))
+        return AudioBuffer(frames, sample_rate, 2, 1)
+
+
+class SineBackend(TTSBackend):
+    """
+    Stand-in engine for tests: a quiet tone whose length follows the text and whose
+    pitch depends on the voice. Needs no speech engine and is fully deterministic.
+    """
+
+    name = "sine"
+
+    def __init__(self, sample_rate=22050, seconds_per_char=0.02):
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+
+    def cache_identity(self, voice=None):
+        return [self.name, voice, self.sample_rate, self.seconds_per_char]
+
+    def synthesize(self, text, voice=None):
+        frequency = 220 + sum(map(ord, voice or '')) % 440
+        count = int(len(text.strip()) * self.seconds_per_char * self.sample_rate)
+        step = 2 * math.pi * frequency / self.sample_rate
+        samples = array.array('h', (int(8000 * math.sin(step * i)) for i in range(count)))
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        return AudioBuffer(samples.tobytes(), self.sample_rate, 2, 1)
+
+
+def create_backend(name=None):
+    """
+    Builds the backend named by `name` or TTS_BACKEND: `say` (macOS), `piper` or `sine`.
+    Defaults to `say` on macOS and `piper` elsewhere.
+    """
+    name = name or os.getenv('TTS_BACKEND') or ('say' if sys.platform == 'darwin' else 'piper')
+    sample_rate = int(os.getenv('TTS_SAMPLE_RATE', '22050'))
+    if name == 'say':
+        return SayBackend(sample_rate)
+    if name == 'piper':
+        model = os.getenv('PIPER_MODEL')
+        if not model:
+            raise ValueError("PIPER_MODEL must point to a Piper .onnx voice model.")
+        return PiperBackend(model, json.loads(os.getenv('PIPER_VOICES', '{}')))
+    if name == 'sine':
+        return SineBackend(sample_rate)
+    raise ValueError(f"Unknown TTS backend: {name}")
+
+
+class SynthesisPool:
+    """
+    Long-lived pool of synthesis workers sharing one backend, so engines and models
+    are loaded once per process instead of once per segment.
+
+    With a `cache` (see tts_cache.TTSCache), texts synthesized before are served from
+    it and only new texts reach the backend.
+    """
+
+    def __init__(self, backend, workers=2, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts')
+
+    def _synthesize(self, text, voice):
+        if self.cache is None:
+            return self.backend.synthesize(text, voice)
+
+        from tts_cache import cache_key
+
+        key = cache_key(self.backend.cache_identity(voice), text)
+        buffer = self.cache.get(key)
+        if buffer is None:
+            buffer = self.backend.synthesize(text, voice)
+            self.cache.put(key, buffer)
+        return buffer
+
+    def submit(self, text, voice=None):
+        return self._executor.submit(self._synthesize, text, voice)
+
+    def map(self, segments):
+        """
+        Synthesizes (voice, text) pairs concurrently and returns their buffers in order.
+        """
+        return list(self.imap(segments))
+
+    def imap(self, segments):
+        """
+        Like `map`, but yields each buffer as soon as it and all earlier ones are ready.
+
+        Segments are submitted lazily with a look-ahead of about twice the worker
+        count, so only that many buffers are held in memory at once.
+        """
+        segments = iter(segments)
+        pending = deque()
+        while True:
+            while len(pending) < 2 * self.workers:
+                segment = next(segments, None)
+                if segment is None:
+                    break
+                voice, text = segment
+                pending.append(self.submit(text, voice))
+            if not pending:
+                return
+            yield pending.popleft().result()
+
+    def close(self):
+        self._executor.shutdown()
+        self.backend.close()
+        if self.cache is not None:
+            self.cache.close()
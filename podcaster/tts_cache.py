@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from tts_backends import AudioBuffer
+
+
+def normalize_sentence(text):
+    """
+    Collapses whitespace so re-wrapped but otherwise identical sentences share an entry.
+    """
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def cache_key(identity, text):
+    """
+    Content address of a sentence: the backend/voice/format identity plus the normalized text.
+    """
+    payload = json.dumps([identity, normalize_sentence(text)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """
+    SQLite cache of synthesized sentences, keyed by `cache_key`.
+
+    Entries hold the PCM frames and their format. When the stored audio exceeds
+    `max_bytes`, the least recently used sentences are evicted down to 90% of it.
+    The stored size is tracked in memory, and recency updates and inserts are
+    committed together every `commit_every` operations or on `flush()`, so a lookup
+    costs no disk sync.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30, commit_every=256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentences ("
+            " key TEXT PRIMARY KEY,"
+            " sample_rate INTEGER NOT NULL,"
+            " sample_width INTEGER NOT NULL,"
+            " channels INTEGER NOT NULL,"
+            " frames BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sentences_last_used ON sentences (last_used)"
+        )
+        self._conn.commit()
+        (self._total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sentences").fetchone()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sample_rate, sample_width, channels, frames FROM sentences WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Recency is written back in batches, not per lookup
+            self._touched[key] = time.time()
+            self._count_operation()
+        sample_rate, sample_width, channels, frames = row
+        return AudioBuffer(bytes(frames), sample_rate, sample_width, channels)
+
+    def put(self, key, buffer):
+        size = len(buffer.frames)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM sentences WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sentences "
+                "(key, sample_rate, sample_width, channels, frames, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, buffer.sample_rate, buffer.sample_width, buffer.channels,
+                 buffer.frames, size, time.time()),
+            )
+            self._touched.pop(key, None)
+            self._total += size - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._count_operation()
+
+    def _count_operation(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._commit()
+
+    def _commit(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE sentences SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def _evict(self):
+        # Pending recency updates first, so recently hit sentences survive
+        self._commit()
+        # Evict down to 90% of the cap, so the scan is not repeated on every insert
+        excess = self._total - int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM sentences ORDER BY last_used"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+            self._total -= size
+        self._conn.executemany("DELETE FROM sentences WHERE key = ?", doomed)
+
+    def flush(self):
+        """
+        Commits pending inserts and recency updates; call once per episode.
+        """
+        with self._lock:
+            self._commit()
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM sentences").fetchone()
+            total = self._total
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
@@ -0,0 +1,140 @@
+import wave
+
+import numpy as np
+
+# Frames read per step when copying an existing WAV file
+COPY_BLOCK_FRAMES = 1 << 16
+
+
+def decode_pcm(frames, sample_width, channels):
+    """
+    Decodes little-endian PCM into a float32 array of shape (samples, channels) in [-1, 1].
+    """
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - (1 << 24), values)
+        samples = values.astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    return samples.reshape(-1, channels)
+
+
+def encode_pcm(samples, sample_width):
+    """
+    Encodes a float32 (samples, channels) array as interleaved little-endian PCM.
+    """
+    samples = np.clip(samples.reshape(-1), -1.0, 1.0)
+    if sample_width == 1:
+        return (samples * 127 + 128).astype(np.uint8).tobytes()
+    if sample_width == 2:
+        return (samples * 32767).astype('<i2').tobytes()
+    if sample_width == 3:
+        values = (samples * ((1 << 23) - 1)).astype(np.int32)
+        return np.stack([values & 0xFF, (values >> 8) & 0xFF, (values >> 16) & 0xFF], axis=1).astype(np.uint8).tobytes()
+    if sample_width == 4:
+        return (samples * ((1 << 31) - 1)).astype('<i4').tobytes()
+    raise ValueError(f"Unsupported sample width: {sample_width}")
+
+
+def convert_pcm(frames, sample_rate, sample_width, channels, to_rate, to_width, to_channels):
+    """
+    Converts PCM between sample rates (linear interpolation), widths and mono/multi-channel.
+    """
+    if (sample_rate, sample_width, channels) == (to_rate, to_width, to_channels):
+        return frames
+
+    samples = decode_pcm(frames, sample_width, channels)
+    if channels != to_channels:
+        if to_channels == 1:
+            samples = samples.mean(axis=1, keepdims=True)
+        elif channels == 1:
+            samples = np.repeat(samples, to_channels, axis=1)
+        else:
+            raise ValueError(f"Cannot convert {channels} channels to {to_channels}")
+
+    if sample_rate != to_rate and len(samples):
+        count = int(round(len(samples) * to_rate / sample_rate))
+        positions = np.arange(count) * (sample_rate / to_rate)
+        source = np.arange(len(samples))
+        samples = np.stack(
+            [np.interp(positions, source, samples[:, channel]) for channel in range(samples.shape[1])],
+            axis=1,
+        ).astype(np.float32)
+
+    return encode_pcm(samples, to_width)
+
+
+class WavAssembler:
+    """
+    Writes a WAV file incrementally: segments are converted to the output format and
+    their frames written as they arrive, and the header sizes are patched on close.
+
+    Memory use is bounded by one segment, and the cost is linear in the output length.
+    """
+
+    def __init__(self, path, sample_rate=22050, sample_width=2, channels=1):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.frames_written = 0
+        self._writer = wave.open(path, 'wb')
+        self._writer.setnchannels(channels)
+        self._writer.setsampwidth(sample_width)
+        self._writer.setframerate(sample_rate)
+
+    def write_frames(self, frames, sample_rate, sample_width, channels):
+        frames = convert_pcm(
+            frames, sample_rate, sample_width, channels,
+            self.sample_rate, self.sample_width, self.channels,
+        )
+        self._writer.writeframesraw(frames)
+        self.frames_written += len(frames) // (self.sample_width * self.channels)
+
+    def write(self, buffer):
+        """
+        Appends an in-memory AudioBuffer (see tts_backends).
+        """
+        self.write_frames(buffer.frames, buffer.sample_rate, buffer.sample_width, buffer.channels)
+
+    def write_silence(self, seconds):
+        """
+        Appends `seconds` of silence in the output format.
+        """
+        count = int(round(seconds * self.sample_rate)) * self.channels
+        # 8-bit WAV is unsigned, so its silence is the midpoint
+        self._writer.writeframesraw((b'\x80' if self.sample_width == 1 else b'\x00' * self.sample_width) * count)
+        self.frames_written += count // self.channels
+
+    def append_wav(self, path):
+        """
+        Appends an existing WAV file, streamed block by block.
+        """
+        with wave.open(path, 'rb') as reader:
+            params = (reader.getframerate(), reader.getsampwidth(), reader.getnchannels())
+            while True:
+                frames = reader.readframes(COPY_BLOCK_FRAMES)
+                if not frames:
+                    break
+                self.write_frames(frames, *params)
+
+    @property
+    def duration(self):
+        return self.frames_written / self.sample_rate
+
+    def close(self):
+        # wave patches the RIFF and data chunk sizes here
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
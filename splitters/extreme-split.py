@@ -1,13 +1,26 @@
+import json
 import os
-from langchain_ollama import OllamaEmbeddings
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from langchain_chroma import Chroma
-from langchain_experimental.text_splitter import SemanticChunker
 from dotenv import load_dotenv
+from openai import OpenAI
 from swarm import Swarm, Agent
 
+# Shared ingest helpers live next to the RAG loader
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ollama_rag"))
+from context_packing import estimate_tokens  # noqa: E402
+from dedup import NearDuplicateFilter  # noqa: E402
+from incremental import IngestManifest, file_sha256, stable_ids, upsert  # noqa: E402
+from llm_journal import ResponseJournal, response_key  # noqa: E402
+from parent_store import PARENT_STORE_FILENAME, ParentStore  # noqa: E402
+from ollama_embed import BatchedOllamaEmbeddings  # noqa: E402
+from semantic_chunker import VectorizedSemanticChunker  # noqa: E402
+
 # Load environment variables
 load_dotenv()
-client = Swarm()
 
 # Get environment variables
 OPENAI_MODEL_NAME = os.getenv('OPENAI_MODEL_NAME')
@@ -16,12 +29,27 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL_NAME_LARGE = os.getenv('OPENAI_MODEL_NAME_LARGE')
 OPENAI_EMBED_NAME = os.getenv('OPENAI_EMBED_NAME')
 OPENAI_BASE_URL_RAG = os.getenv('OPENAI_BASE_URL_RAG')
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+EMBED_MAX_IN_FLIGHT = int(os.getenv('EMBED_MAX_IN_FLIGHT', '4'))
+MANIFEST_FILENAME = "extreme_split_manifest.sqlite3"
+JOURNAL_FILENAME = "decomposition_journal.jsonl"
+DECOMPOSE_MAX_IN_FLIGHT = int(os.getenv('DECOMPOSE_MAX_IN_FLIGHT', '4'))
+DECOMPOSE_RETRIES = int(os.getenv('DECOMPOSE_RETRIES', '2'))
+DECOMPOSE_TIMEOUT = float(os.getenv('DECOMPOSE_TIMEOUT', '300'))
+# Token budget for packing several chunks into one JSON request; 0 sends one chunk per request
+DECOMPOSE_BATCH_TOKENS = int(os.getenv('DECOMPOSE_BATCH_TOKENS', '0'))
+# Statements at least this similar (estimated Jaccard) to an earlier one are dropped; 0 disables
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '256'))
 
 # Validate environment variables
 required_env_vars = [OPENAI_MODEL_NAME, OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_EMBED_NAME, OPENAI_BASE_URL_RAG]
 if any(env_var is None for env_var in required_env_vars):
     raise ValueError("Some required environment variables are not set.")
 
+# The OpenAI client enforces the per-request timeout; retries are handled per chunk below
+client = Swarm(client=OpenAI(timeout=DECOMPOSE_TIMEOUT, max_retries=0))
+
 # Create an Agent for rephrasing
 rephrase_agent = Agent(
     name="rephrase_assistant",
@@ -48,28 +76,253 @@ Output:
 - What should you do?
 '''
 
+DECOMPOSE_PROMPT_TEMPLATE = (
+    "Take the provided text and transform each sentence into one or multiple standalone statements. "
+    "Each statement should be self-contained, meaning it conveys a complete idea on its own and is "
+    "understandable without requiring additional context or modifying the original idea"
+    "example: Input: Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances, Google Kubernetes Engine (GKE) clusters. It also works with serverless workloads. Output: - Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances. - Virtual Private Cloud (VPC) provides networking functionality to Google Kubernetes Engine (GKE) clusters. - Virtual Private Cloud (VPC) provides networking functionality to serverless workloads."
+    "Reply with the output only, don't add intros or explanations:\n{chunk}"
+)
+
+BATCH_DECOMPOSE_PROMPT_TEMPLATE = (
+    "Take each of the provided texts and transform each sentence into one or multiple standalone statements. "
+    "Each statement should be self-contained, meaning it conveys a complete idea on its own and is "
+    "understandable without requiring additional context or modifying the original idea. "
+    "example: Input: Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances, Google Kubernetes Engine (GKE) clusters. It also works with serverless workloads. Output: - Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances. - Virtual Private Cloud (VPC) provides networking functionality to Google Kubernetes Engine (GKE) clusters. - Virtual Private Cloud (VPC) provides networking functionality to serverless workloads. "
+    "The texts are given as a JSON object mapping a chunk ID to its text. Reply with a JSON object only, "
+    "mapping every chunk ID to the list of its statements, e.g. {{\"1\": [\"statement\", \"statement\"]}}. "
+    "Don't add intros, explanations or code fences:\n{chunks}"
+)
 
 # Initialize embedding model
 try:
-    embed_model = OllamaEmbeddings(
+    embed_model = BatchedOllamaEmbeddings(
         model=OPENAI_EMBED_NAME,
-        base_url=OPENAI_BASE_URL_RAG
+        base_url=OPENAI_BASE_URL_RAG,
+        batch_size=EMBED_BATCH_SIZE,
+        max_in_flight=EMBED_MAX_IN_FLIGHT
     )
 except Exception as e:
     raise RuntimeError(f"Failed to initialize Ollama embeddings: {e}")
 
-def create_and_persist_vector_store(file_path: str, persist_directory: str, decomposition_output_path: str):
+def decomposition_key(chunk: str, prompt_template: str = DECOMPOSE_PROMPT_TEMPLATE) -> str:
+    """
+    Journal key for a chunk; changes whenever the model, the instructions or the prompt do.
+    """
+    return response_key(rephrase_agent.model, rephrase_agent.instructions + prompt_template, chunk)
+
+def run_rephrase_agent(content: str, retries: int = DECOMPOSE_RETRIES) -> str:
+    """
+    Sends one message to the rephrase agent and returns its reply.
+
+    Failed or timed-out requests are retried with exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = client.run(
+                agent=rephrase_agent,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": content
+                    }
+                ],
+            )
+            return response.messages[-1]["content"].strip()
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            print(f"Decomposition attempt {attempt + 1} failed ({e}), retrying...")
+            time.sleep(2 ** attempt)
+
+def decompose_chunk(chunk: str, retries: int = DECOMPOSE_RETRIES, journal: ResponseJournal = None) -> list:
+    """
+    Asks the rephrase agent to decompose one chunk into standalone statements.
+
+    With a journal, a previously decomposed chunk is returned without calling the
+    model, and every new result is journaled as soon as it arrives.
+    """
+    if journal is not None:
+        key = decomposition_key(chunk)
+        cached = journal.get(key)
+        if cached is not None:
+            return cached
+
+    # Parse the rephrased content
+    content = run_rephrase_agent(DECOMPOSE_PROMPT_TEMPLATE.format(chunk=chunk), retries)
+    decomposition = [line.strip() for line in content.split("\n- ") if line.strip()]
+    if journal is not None:
+        journal.append(key, decomposition)
+    return decomposition
+
+def parse_batch_response(content: str, chunk_ids: list) -> dict:
+    """
+    Parses a batched reply into {chunk ID: statements}, raising ValueError unless
+    every chunk ID maps to a list of strings.
+    """
+    # Tolerate a reply wrapped in a code fence despite the instructions
+    if content.startswith("```"):
+        content = content.strip("`").split("\n", 1)[-1]
+    result = json.loads(content)
+    if not isinstance(result, dict):
+        raise ValueError("reply is not a JSON object")
+
+    decompositions = {}
+    for chunk_id in chunk_ids:
+        statements = result.get(chunk_id)
+        if not isinstance(statements, list) or not all(isinstance(statement, str) for statement in statements):
+            raise ValueError(f"missing or malformed statements for chunk {chunk_id}")
+        decompositions[chunk_id] = [statement.strip() for statement in statements if statement.strip()]
+    return decompositions
+
+def decompose_batch(chunks: list, retries: int = DECOMPOSE_RETRIES, journal: ResponseJournal = None) -> list:
+    """
+    Decomposes several chunks with one request asking for JSON, so the instructions
+    are sent once per batch instead of once per chunk.
+
+    Returns one decomposition per chunk, in order. When the reply fails to parse or
+    validate, each chunk is retried on its own; a chunk that still fails gets None.
+    Chunks journaled by either the batched or the per-chunk prompt are not resent.
+    """
+    decompositions = [None] * len(chunks)
+    keys = [decomposition_key(chunk, BATCH_DECOMPOSE_PROMPT_TEMPLATE) for chunk in chunks]
+    missing = []
+    for index, key in enumerate(keys):
+        cached = journal.get(key, decomposition_key(chunks[index])) if journal is not None else None
+        if cached is None:
+            missing.append(index)
+        else:
+            decompositions[index] = cached
+    if not missing:
+        return decompositions
+
+    # Short local IDs keep the request small; they only need to be unique in the batch
+    request = {str(number): chunks[index] for number, index in enumerate(missing, start=1)}
+    try:
+        content = run_rephrase_agent(
+            BATCH_DECOMPOSE_PROMPT_TEMPLATE.format(chunks=json.dumps(request, ensure_ascii=False)), retries
+        )
+        parsed = parse_batch_response(content, list(request))
+    except Exception as e:
+        print(f"Batched decomposition of {len(missing)} chunks failed ({e}), falling back to one request per chunk")
+        for index in missing:
+            try:
+                decompositions[index] = decompose_chunk(chunks[index], retries, journal)
+            except Exception as chunk_error:
+                print(f"Failed to decompose chunk: {chunk_error}")
+        return decompositions
+
+    for chunk_id, index in zip(request, missing):
+        decompositions[index] = parsed[chunk_id]
+        if journal is not None:
+            journal.append(keys[index], parsed[chunk_id])
+    return decompositions
+
+def pack_batches(chunks: list, token_budget: int) -> list:
+    """
+    Groups consecutive chunks into batches of at most `token_budget` estimated tokens.
+    A chunk larger than the budget gets a batch of its own.
+    """
+    batches = []
+    batch, used = [], 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk)
+        if batch and used + tokens > token_budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(chunk)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def decompose_chunks(chunks: list, max_in_flight: int = DECOMPOSE_MAX_IN_FLIGHT, journal: ResponseJournal = None, batch_tokens: int = DECOMPOSE_BATCH_TOKENS):
+    """
+    Decomposes chunks with up to `max_in_flight` concurrent LLM calls.
+
+    With a non-zero `batch_tokens`, consecutive chunks are packed into JSON requests
+    of about that many tokens (see `decompose_batch`); otherwise each chunk gets its
+    own request. Yields (chunk, decomposition) in chunk order; a chunk that still
+    fails after its retries yields None as its decomposition. Progress and throughput
+    are printed as chunks complete.
+    """
+    if batch_tokens:
+        batches = pack_batches(chunks, batch_tokens)
+
+        def decompose(batch):
+            return decompose_batch(batch, DECOMPOSE_RETRIES, journal)
+    else:
+        batches = [[chunk] for chunk in chunks]
+
+        def decompose(batch):
+            return [decompose_chunk(batch[0], DECOMPOSE_RETRIES, journal)]
+
+    started = time.perf_counter()
+    total = len(chunks)
+    done = 0
+    pending = deque()
+    next_index = 0
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch in batches:
+            # Keep a few requests queued beyond the in-flight ones so workers never idle
+            while next_index < len(batches) and len(pending) < 2 * max_in_flight:
+                pending.append(executor.submit(decompose, batches[next_index]))
+                next_index += 1
+
+            try:
+                decompositions = pending.popleft().result()
+            except Exception as e:
+                print(f"Failed to decompose chunks {done + 1}-{done + len(batch)}/{total}: {e}")
+                decompositions = [None] * len(batch)
+
+            for chunk, decomposition in zip(batch, decompositions):
+                done += 1
+                elapsed = time.perf_counter() - started
+                rate = done / elapsed if elapsed else 0.0
+                eta = (total - done) / rate if rate else 0.0
+                print(f"Decomposed {done}/{total} chunks ({rate:.2f} chunks/s, ETA {eta:.0f}s)")
+                yield chunk, decomposition
+
+def create_and_persist_vector_store(file_path: str, persist_directory: str, decomposition_output_path: str, incremental: bool = False, max_in_flight: int = DECOMPOSE_MAX_IN_FLIGHT, batch_size: int = INGEST_BATCH_SIZE, batch_tokens: int = DECOMPOSE_BATCH_TOKENS, dedup_threshold: float = DEDUP_THRESHOLD):
     """
     Reads a file, splits the text into chunks, decomposes the text into standalone statements, 
     embeds it, and persists the vector store. Also saves the decomposition to a text file.
+
+    Chunks are decomposed with up to `max_in_flight` concurrent LLM calls, keeping
+    chunk order, packing chunks into `batch_tokens`-sized JSON requests when set.
+    Chunks that fail after retries are skipped and reported. Statements
+    are buffered and embedded and upserted `batch_size` at a time through a single
+    collection handle.
+
+    Decompositions are journaled per chunk in the persist directory, so a resumed or
+    repeated run only calls the model for new or changed chunks, and the statements
+    file is written progressively as chunks complete.
+
+    Exact and near-duplicate statements (see `dedup.NearDuplicateFilter`) are dropped
+    before indexing, so repeats across neighbouring chunks are embedded only once.
+
+    Each chunk is written once to the parent store, keyed by its chunk ID, and its
+    statements reference it through their `parent_id` metadata.
+
+    Statements are written with deterministic IDs, so re-running upserts instead of
+    appending duplicates. In incremental mode an unchanged file is skipped entirely,
+    statements already recorded for a changed file are not embedded again and
+    statements that are no longer produced are deleted from the store.
     """
     try:
+        manifest = IngestManifest(os.path.join(persist_directory, MANIFEST_FILENAME))
+        digest = file_sha256(file_path)
+        if incremental and manifest.is_unchanged(file_path, digest):
+            print(f"Skipping unchanged file: {file_path}")
+            return Chroma(persist_directory=persist_directory, embedding_function=embed_model)
+
         # Read the file content
         with open(file_path, "r") as f:
             text = f.read()
 
         # Initialize the text splitter
-        text_splitter = SemanticChunker(
+        text_splitter = VectorizedSemanticChunker(
             embed_model, 
             breakpoint_threshold_type="gradient"
         )
@@ -78,62 +331,111 @@ def create_and_persist_vector_store(file_path: str, persist_directory: str, deco
         # Log the initial chunks for debugging
         print(f"Initial chunks: {chunks[:5]}...")  # Print first 5 chunks for brevity
 
-        # Aggregate all decomposed statements
-        all_decompositions = []
+        # One collection handle for the whole run
+        vector_store = Chroma(persist_directory=persist_directory, embedding_function=embed_model)
 
-        for chunk in chunks:
-            response = client.run(
-                agent=rephrase_agent,
-                messages=[
+        parent_store = ParentStore(os.path.join(persist_directory, PARENT_STORE_FILENAME))
+        journal = ResponseJournal(os.path.join(persist_directory, JOURNAL_FILENAME))
+        output_file = open(decomposition_output_path, "w")
+
+        all_statement_ids = []
+        buffer_texts, buffer_ids, buffer_metadatas = [], [], []
+        buffer_parents = []
+
+        def flush():
+            if buffer_parents:
+                # Parents go first, so no indexed statement points at a missing parent
+                parent_store.put_many(buffer_parents)
+                buffer_parents.clear()
+            if buffer_texts:
+                # Statements indexed by an earlier run of this file are left as they are
+                known = manifest.known_ids(file_path, buffer_ids) if incremental else set()
+                new_rows = [i for i, statement_id in enumerate(buffer_ids) if statement_id not in known]
+                if new_rows:
+                    upsert(
+                        vector_store,
+                        [buffer_ids[i] for i in new_rows],
+                        [buffer_texts[i] for i in new_rows],
+                        [buffer_metadatas[i] for i in new_rows],
+                    )
+                print(f"Upserted {len(new_rows)} statements, kept {len(known)} already indexed")
+                buffer_texts.clear()
+                buffer_ids.clear()
+                buffer_metadatas.clear()
+
+        dedup = NearDuplicateFilter(threshold=dedup_threshold) if dedup_threshold else None
+        failed_chunks = 0
+        chunk_ids = stable_ids(file_path, chunks)
+
+        try:
+            for chunk_id, (chunk, decomposition) in zip(chunk_ids, decompose_chunks(chunks, max_in_flight, journal, batch_tokens)):
+                if decomposition is None:
+                    failed_chunks += 1
+                    continue
+                if dedup is not None:
+                    decomposition = dedup.filter(decomposition)
+                    if not decomposition:
+                        continue
+                print(f"Decomposition for the current chunk: {decomposition}...")   
+
+                # Append to the statements file as chunks complete
+                output_file.writelines(statement + "\n" for statement in decomposition)
+                output_file.flush()
+
+                # Add metadata to each statement; the chunk text itself lives in the parent store
+                buffer_parents.append((chunk_id, file_path, chunk))
+                metadata_statements = [
                     {
-                        "role": "user",
-                        "content": (
-                            f"Take the provided text and transform each sentence into one or multiple standalone statements. "
-                            f"Each statement should be self-contained, meaning it conveys a complete idea on its own and is "
-                            f"understandable without requiring additional context or modifying the original idea"
-                            f"example: Input: Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances, Google Kubernetes Engine (GKE) clusters. It also works with serverless workloads. Output: - Virtual Private Cloud (VPC) provides networking functionality to Compute Engine virtual machine (VM) instances. - Virtual Private Cloud (VPC) provides networking functionality to Google Kubernetes Engine (GKE) clusters. - Virtual Private Cloud (VPC) provides networking functionality to serverless workloads."
-                            f"Reply with the output only, don't add intros or explanations:\n{chunk}"
-                        )
+                        "parent_id": chunk_id,
+                        "length": len(statement),
+                        "source_file": file_path
                     }
-                ],
-            )
+                    for statement in decomposition
+                ]
 
-            # Parse the rephrased content
-            content = response.messages[-1]["content"].strip()
-            decomposition = [line.strip() for line in content.split("\n- ") if line.strip()]
-            print(f"Decomposition for the current chunk: {decomposition}...")   
-
-            # Append to the aggregated list
-            all_decompositions.extend(decomposition)
-
-            # Add metadata to each statement
-            metadata_statements = [
-                {
-                    "context": chunk,
-                    "length": len(statement),
-                    "source_file": file_path
-                }
-                for statement in decomposition
-            ]
-
-            # Create the vector store and persist it
-            vector_store = Chroma.from_texts(
-                texts=decomposition,
-                embedding=embed_model,
-                persist_directory=persist_directory,
-                metadatas=metadata_statements
-            )
-            print(f"--" * 80) 
-            print(f"Chunk being processed: {chunk}...")
-            print(f" -- " * 80)
-            print(f"decomposition being processed: {decomposition}...")
-            print(f" --| " * 80)
-            print(f"decomposition being processed: {metadata_statements}...")
-
-        # Save all decompositions to a text file
-        with open(decomposition_output_path, "w") as output_file:
-            for statement in all_decompositions:
-                output_file.write(statement + "\n")
+                # Statement IDs derive from the parent chunk ID, so reruns upsert in place
+                statement_ids = stable_ids(chunk_id, decomposition)
+                all_statement_ids.extend(statement_ids)
+
+                # Buffer the statements and write them in large batches
+                buffer_texts.extend(decomposition)
+                buffer_ids.extend(statement_ids)
+                buffer_metadatas.extend(metadata_statements)
+                if len(buffer_texts) >= batch_size:
+                    flush()
+
+                print(f"--" * 80) 
+                print(f"Chunk being processed: {chunk}...")
+                print(f" -- " * 80)
+                print(f"decomposition being processed: {decomposition}...")
+                print(f" --| " * 80)
+                print(f"decomposition being processed: {metadata_statements}...")
+        finally:
+            output_file.close()
+            journal.close()
+
+        flush()
+        print(f"Journal: {journal.hits} chunks reused, {journal.misses} decomposed")
+        if dedup is not None:
+            stats = dedup.stats()
+            print(f"Dedup: kept {stats['kept']} of {stats['seen']} statements, dropped "
+                  f"{stats['exact_dropped']} exact and {stats['near_dropped']} near duplicates "
+                  f"({stats['dropped_ratio']:.1%})")
+
+        if failed_chunks:
+            # Leave the manifest alone so the next run retries this file
+            print(f"Warning: {failed_chunks} of {len(chunks)} chunks could not be decomposed.")
+        else:
+            if incremental:
+                stale = sorted(set(manifest.ids_for(file_path)) - set(all_statement_ids))
+                if stale:
+                    vector_store.delete(ids=stale)
+                print(f"Deleted {len(stale)} stale statements for {file_path}")
+                stale_parents = parent_store.retain_source(file_path, chunk_ids)
+                print(f"Deleted {stale_parents} stale parent chunks for {file_path}")
+            manifest.update(file_path, digest, all_statement_ids)
+            manifest.save()
+        parent_store.close()
 
         print(f"Decomposed statements saved to: {decomposition_output_path}")
         print(f"Vector store created and persisted at: {persist_directory}")
@@ -155,4 +457,4 @@ if __name__ == "__main__":
         raise FileNotFoundError(f"The file {file_path} does not exist.")
 
     # Create and persist vector store
-    vector_store = create_and_persist_vector_store(file_path, persist_directory, decomposition_output_path)
\ No newline at end of file
+    vector_store = create_and_persist_vector_store(file_path, persist_directory, decomposition_output_path, incremental=True)
\ No newline at end of file